@@ -0,0 +1,187 @@
+# Day 05 - Log format parsers used by sample_log_analyzer.py
+import json
+import re
+import time
+
+
+class LogRecord:
+    """
+    One parsed log line. __slots__ keeps each record small,
+    the message itself stays in the line from message_offset on,
+    unless the format encodes it (JSON) and message holds the decoded text.
+    """
+    __slots__ = ("timestamp", "level", "message_offset", "message")
+
+    def __init__(self, timestamp, level, message_offset, message=None):
+        self.timestamp = timestamp
+        self.level = level
+        self.message_offset = message_offset
+        self.message = message
+
+    def text(self, line):
+        """
+        The message of the record parsed from line
+        """
+        if self.message is not None:
+            return self.message
+        return line[self.message_offset:].rstrip("\n")
+
+    def __repr__(self):
+        return f"LogRecord({self.timestamp!r}, {self.level!r}, {self.message_offset})"
+
+
+PARSERS = {}  # format name -> function(line) returning a LogRecord or None
+SAMPLES = {}  # format name -> sample line used by benchmark()
+
+LEVEL_ALIASES = {"WARN": "WARNING", "ERR": "ERROR", "CRITICAL": "ERROR", "FATAL": "ERROR"}
+# Syslog severity (PRI % 8): emerg, alert, crit, err, warning, notice, info, debug
+SYSLOG_LEVELS = ("ERROR", "ERROR", "ERROR", "ERROR", "WARNING", "INFO", "INFO", "DEBUG")
+
+
+def register(name, sample):
+    """
+    Decorator that adds a parser to PARSERS under the given format name
+    """
+    def decorator(parse):
+        PARSERS[name] = parse
+        SAMPLES[name] = sample
+        return parse
+    return decorator
+
+
+def normalize_level(level):
+    """
+    Upper-case a level and map aliases like WARN to WARNING
+    """
+    level = level.upper()
+    return LEVEL_ALIASES.get(level, level)
+
+
+def keyword_level(text):
+    """
+    Level from the first of INFO / WARNING / ERROR found in text
+    """
+    for level in ("INFO", "WARNING", "ERROR"):
+        if level in text:
+            return level
+    return "UNKNOWN"
+
+
+PLAIN_RE = re.compile(r"(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d) +([A-Za-z]+)\b ?")
+
+
+@register("plain", "2025-01-10 09:00:01 INFO Application started successfully\n")
+def parse_plain(line):
+    """
+    YYYY-MM-DD HH:MM:SS LEVEL message
+    """
+    match = PLAIN_RE.match(line)
+    if match is None:
+        return None
+    return LogRecord(match.group(1), normalize_level(match.group(2)), match.end())
+
+
+JSON_TIME_KEYS = ("timestamp", "time", "@timestamp", "ts")
+JSON_LEVEL_KEYS = ("level", "severity", "levelname", "lvl")
+JSON_MESSAGE_KEYS = ("message", "msg")
+
+
+@register("json", '{"timestamp": "2025-01-10T09:00:01Z", "level": "info", "message": "Application started"}\n')
+def parse_json(line):
+    """
+    One JSON object per line, e.g. {"timestamp": ..., "level": ..., "message": ...}
+    """
+    if not line.startswith("{"):
+        return None
+    try:
+        data = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    timestamp = next((data[key] for key in JSON_TIME_KEYS if key in data), None)
+    level = next((data[key] for key in JSON_LEVEL_KEYS if key in data), None)
+    level = normalize_level(str(level)) if level is not None else "UNKNOWN"
+    message = next((data[key] for key in JSON_MESSAGE_KEYS if key in data), None)
+    if message is not None and not isinstance(message, str):
+        message = json.dumps(message)
+    offset = len(line)
+    for key in JSON_MESSAGE_KEYS:
+        pos = line.find(f'"{key}"')
+        if pos != -1:
+            # Point at the first character of the message value.
+            offset = line.find(":", pos) + 1
+            while line[offset:offset + 1] == " ":
+                offset += 1
+            if line[offset:offset + 1] == '"':
+                offset += 1
+            break
+    return LogRecord(timestamp, level, offset, message)
+
+
+NGINX_RE = re.compile(r'\S+ \S+ \S+ \[([^\]]+)\] "([^"]*)" (\d{3}) ')
+
+
+@register("nginx", '127.0.0.1 - - [10/Jan/2025:09:00:01 +0000] "GET /health HTTP/1.1" 200 2 "-" "curl/8.0"\n')
+def parse_nginx(line):
+    """
+    nginx "combined" access log, the level comes from the status code
+    """
+    match = NGINX_RE.match(line)
+    if match is None:
+        return None
+    status = match.group(3)
+    if status[0] == "5":
+        level = "ERROR"
+    elif status[0] == "4":
+        level = "WARNING"
+    else:
+        level = "INFO"
+    return LogRecord(match.group(1), level, match.start(2))
+
+
+SYSLOG_RE = re.compile(r"(?:<(\d{1,3})>)?([A-Z][a-z]{2} [ \d]\d \d\d:\d\d:\d\d) \S+ [^:\s]+: ")
+
+
+@register("syslog", "<14>Jan 10 09:00:01 web01 app[123]: Application started\n")
+def parse_syslog(line):
+    """
+    BSD syslog (RFC 3164), the level comes from <PRI> or from the message
+    """
+    match = SYSLOG_RE.match(line)
+    if match is None:
+        return None
+    if match.group(1):
+        level = SYSLOG_LEVELS[int(match.group(1)) % 8]
+    else:
+        level = keyword_level(line[match.end():])
+    return LogRecord(match.group(2), level, match.end())
+
+
+def detect_format(lines):
+    """
+    Return the format name whose parser understands most of the given
+    lines, or None if no parser understands any of them
+    """
+    best, best_hits = None, 0
+    for name, parse in PARSERS.items():
+        hits = sum(1 for line in lines if parse(line) is not None)
+        if hits > best_hits:
+            best, best_hits = name, hits
+    return best
+
+
+def benchmark(count=200_000):
+    """
+    Parse a sample line of every format count times and print the throughput
+    """
+    results = {}
+    for name, parse in PARSERS.items():
+        line = SAMPLES[name]
+        start = time.perf_counter()
+        for _ in range(count):
+            parse(line)
+        elapsed = time.perf_counter() - start
+        results[name] = count / elapsed
+        print(f"{name}: {results[name]:,.0f} lines/s")
+    return results
@@ -0,0 +1,253 @@
+# Day 05 - Parquet store for parsed log records, written by sample_log_analyzer.py
+import argparse
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from functools import lru_cache
+
+ROW_GROUP_SIZE = 128 * 1024  # records per row group, each group sorted by time
+COLUMNS = ("timestamp", "level", "message")
+EPOCH_MILLISECONDS = 1e11  # bigger epoch numbers are milliseconds (1e11 s is year 5138)
+# Timestamp layouts that datetime.fromisoformat() does not read
+TIME_FORMATS = (
+    "%d/%b/%Y:%H:%M:%S %z",  # nginx
+    "%b %d %H:%M:%S",  # syslog, no year
+)
+
+
+def import_pyarrow():
+    """
+    Import pyarrow and its parquet / compute modules,
+    or exit with a hint if it is not installed
+    """
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.parquet
+    except ImportError:
+        print("Error: Parquet export and queries need 'pip install pyarrow'.", file=sys.stderr)
+        sys.exit(1)
+    return pyarrow
+
+
+def parse_epoch(value):
+    """
+    Epoch seconds or milliseconds as a naive UTC datetime, None when out of range
+    """
+    seconds = value / 1000 if abs(value) > EPOCH_MILLISECONDS else value
+    try:
+        return datetime.fromtimestamp(seconds, timezone.utc).replace(tzinfo=None)
+    except (OverflowError, OSError, ValueError):
+        return None
+
+
+def parse_timestamp(value):
+    """
+    Turn the timestamp of a LogRecord into a naive UTC datetime,
+    None if it is missing or in an unknown layout. Numbers (JSON "ts": 1736499601)
+    are epoch seconds, or milliseconds when too big for seconds; objects and
+    arrays from JSON lines have no time.
+    """
+    if value is None or value == "" or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return parse_epoch(value)
+    if not isinstance(value, str):
+        return None
+    return parse_timestamp_text(value)
+
+
+@lru_cache(maxsize=4096)
+def parse_timestamp_text(value):
+    """
+    parse_timestamp() of a text timestamp.
+    Cached because consecutive lines mostly share their timestamp.
+    """
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        parsed = None
+        for layout in TIME_FORMATS:
+            try:
+                parsed = datetime.strptime(value, layout)
+            except ValueError:
+                continue
+            if parsed.year == 1900:  # syslog lines carry no year
+                parsed = parsed.replace(year=datetime.now().year)
+            break
+        if parsed is None:
+            try:
+                return parse_epoch(float(value))  # "1736499601" as text
+            except ValueError:
+                return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+class ParquetExporter:
+    """
+    Writes (timestamp, level, message) rows to a Parquet file.
+    Rows are buffered and written ROW_GROUP_SIZE at a time, each row
+    group sorted by timestamp, so the min / max statistics of a row
+    group tell a query whether it can be skipped.
+    """
+
+    def __init__(self, path, row_group_size=ROW_GROUP_SIZE):
+        self.pa = import_pyarrow()
+        self.path = path
+        self.row_group_size = row_group_size
+        self.schema = self.pa.schema([
+            ("timestamp", self.pa.timestamp("s")),
+            ("level", self.pa.string()),
+            ("message", self.pa.string()),
+        ])
+        self.columns = ([], [], [])
+        self.rows = 0
+        self.writer = self.pa.parquet.ParquetWriter(
+            path, self.schema, compression="zstd",
+            sorting_columns=[self.pa.parquet.SortingColumn(0, nulls_first=False)])
+
+    def add(self, timestamp, level, message):
+        """
+        Buffer one row, timestamp is the text from the LogRecord
+        """
+        self.columns[0].append(parse_timestamp(timestamp))
+        self.columns[1].append(level)
+        self.columns[2].append(message)
+        if len(self.columns[1]) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered rows as one row group
+        """
+        if not self.columns[1]:
+            return
+        table = self.pa.Table.from_arrays(
+            [self.pa.array(column, type=field.type) for column, field in zip(self.columns, self.schema)],
+            schema=self.schema)
+        table = table.sort_by([("timestamp", "ascending")])  # nulls last, as sorting_columns says
+        self.writer.write_table(table, row_group_size=len(table))
+        self.rows += len(table)
+        self.columns = ([], [], [])
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def row_group_matches(metadata, index, level=None, since=None, until=None):
+    """
+    False when the statistics of row group index prove that no row
+    has the level or a timestamp in [since, until)
+    """
+    row_group = metadata.row_group(index)
+    for column in range(row_group.num_columns):
+        chunk = row_group.column(column)
+        stats = chunk.statistics
+        if stats is None or not stats.has_min_max:
+            continue
+        if chunk.path_in_schema == "timestamp":
+            if since is not None and stats.max < since:
+                return False
+            if until is not None and stats.min >= until:
+                return False
+        elif chunk.path_in_schema == "level" and level is not None:
+            if not stats.min <= level <= stats.max:
+                return False
+    return True
+
+
+def query(path, level=None, since=None, until=None, contains=None, columns=COLUMNS):
+    """
+    Read the rows of a Parquet log file that match every given filter.
+    Only the wanted columns plus the ones the filters need are read, and
+    row groups are skipped when their statistics rule them out.
+    Returns (table, row groups read, row groups in the file)
+    """
+    pa = import_pyarrow()
+    pc = pa.compute
+    parquet_file = pa.parquet.ParquetFile(path)
+    metadata = parquet_file.metadata
+    groups = [index for index in range(metadata.num_row_groups)
+              if row_group_matches(metadata, index, level, since, until)]
+    needed = set(columns)
+    if level is not None:
+        needed.add("level")
+    if since is not None or until is not None:
+        needed.add("timestamp")
+    if contains is not None:
+        needed.add("message")
+    table = parquet_file.read_row_groups(groups, columns=[name for name in COLUMNS if name in needed])
+
+    mask = None
+    conditions = []
+    if level is not None:
+        conditions.append(pc.equal(table["level"], level))
+    if since is not None:
+        conditions.append(pc.greater_equal(table["timestamp"], pa.scalar(since, pa.timestamp("s"))))
+    if until is not None:
+        conditions.append(pc.less(table["timestamp"], pa.scalar(until, pa.timestamp("s"))))
+    if contains is not None:
+        conditions.append(pc.match_substring(table["message"], contains))
+    for condition in conditions:
+        mask = condition if mask is None else pc.and_(mask, condition)
+    if mask is not None:
+        table = table.filter(mask)
+    return table.select([name for name in COLUMNS if name in columns]), len(groups), metadata.num_row_groups
+
+
+def parse_time(value):
+    """
+    argparse type for --since / --until, e.g. 2025-01-10 or "2025-01-10 09:30"
+    """
+    parsed = parse_timestamp(value)
+    if parsed is None:
+        raise argparse.ArgumentTypeError(f"invalid time '{value}' (e.g. 2025-01-10 09:30)")
+    return parsed
+
+
+def main():
+    """
+    Command line entrypoint: log_store.py query FILE.parquet [filters]
+    """
+    parser = argparse.ArgumentParser(description="Day 05 Parquet log store")
+    commands = parser.add_subparsers(dest="command", required=True)
+    query_parser = commands.add_parser("query", help="Count or show the records that match the filters")
+    query_parser.add_argument("parquet_file", help="File written by sample_log_analyzer.py --export parquet")
+    query_parser.add_argument("--level", type=str.upper, help="Only records of this level, e.g. ERROR")
+    query_parser.add_argument("--since", type=parse_time, help="Only records at or after this time")
+    query_parser.add_argument("--until", type=parse_time, help="Only records before this time")
+    query_parser.add_argument("--contains", help="Only records whose message contains this text")
+    query_parser.add_argument("--limit", type=int, default=0,
+                              help="Also print the first LIMIT matching records")
+    args = parser.parse_args()
+
+    columns = ("level",) if not args.limit else COLUMNS
+    start = time.perf_counter()
+    try:
+        table, read, total = query(args.parquet_file, args.level, args.since, args.until,
+                                   args.contains, columns)
+    except FileNotFoundError:
+        print("Parquet file not found:", args.parquet_file)
+        return
+    elapsed = time.perf_counter() - start
+
+    print("Log Analysis Summary:")
+    for level, count in Counter(table["level"].to_pylist()).most_common():
+        print(f"{level}: {count}")
+    for row in table.slice(0, args.limit).to_pylist() if args.limit else ():
+        print(row["timestamp"], row["level"], row["message"])
+    print(f"{len(table)} records from {read} of {total} row groups in {elapsed:.3f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
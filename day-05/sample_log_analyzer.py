@@ -1,38 +1,119 @@
 # Day 05 - Log Analyzer (Sample File For your Reference)
+import argparse
+import gzip
+import sys
+from itertools import chain, islice
+
+from log_parsers import PARSERS, benchmark, detect_format
+from log_store import ParquetExporter
+
+BUFFER_SIZE = 1024 * 1024  # bytes read from disk at a time
+DETECT_LINES = 50  # lines looked at to guess the log format
+
 
 class LogAnalyzer:
-    def __init__(self, log_file):
+    def __init__(self, log_file, log_format=None):
         """
         __init__ function runs first and initializes
         the values into class variables.
+        log_format is None (keyword search), "auto" or a name from PARSERS
         """
         self.log_file = log_file
+        self.log_format = log_format
         self.counts = {"INFO": 0, "WARNING": 0, "ERROR": 0, "UNKNOWN": 0}
 
     def read_logs(self):
         """
-        Function to read logs from the given log file
+        Generator that yields the log file one line at a time,
+        "-" reads stdin and *.gz files are decompressed on the fly
         """
+        if self.log_file == "-":
+            yield from sys.stdin
+            return
         try:
-            with open(self.log_file, "r") as f:
-                return f.readlines()
+            if self.log_file.endswith(".gz"):
+                f = gzip.open(self.log_file, "rt")
+            else:
+                f = open(self.log_file, "r", buffering=BUFFER_SIZE)
         except FileNotFoundError:
             print("Log file not found:", self.log_file)
-            return []
+            return
+        with f:
+            yield from f
 
-    def analyze(self, lines):
+    def records(self, lines):
         """
-        Analyzer to count the error patterns & Counts
+        Generator of (line, LogRecord or None) using the format parser,
+        "auto" picks the format from the first DETECT_LINES lines
         """
+        lines = iter(lines)
+        log_format = self.log_format
+        if log_format == "auto":
+            head = list(islice(lines, DETECT_LINES))
+            log_format = detect_format(head)
+            lines = chain(head, lines)
+            if log_format is None:
+                print("Could not detect the log format, using keyword search")
+        parse = PARSERS.get(log_format)
+        for line in lines:
+            yield line, parse(line) if parse else None
+
+    def classify(self, lines):
+        """
+        Generator that turns each line into its log level
+        """
+        if self.log_format is not None:
+            for line, record in self.records(lines):
+                if record is None:
+                    yield "UNKNOWN"
+                else:
+                    yield record.level
+            return
         for line in lines:
             if "INFO" in line:
-                self.counts["INFO"] += 1
+                yield "INFO"
             elif "WARNING" in line:
-                self.counts["WARNING"] += 1
+                yield "WARNING"
             elif "ERROR" in line:
-                self.counts["ERROR"] += 1
+                yield "ERROR"
             else:
-                self.counts["UNKNOWN"] += 1
+                yield "UNKNOWN"
+
+    def count(self, level):
+        """
+        Add one line of the given level to the counts
+        """
+        if level not in self.counts:
+            level = "UNKNOWN"
+        self.counts[level] += 1
+
+    def analyze(self, lines):
+        """
+        Analyzer to count the error patterns & Counts,
+        lines can be any iterable (file, stdin, gzip stream)
+        """
+        for level in self.classify(lines):
+            self.count(level)
+
+        return self.counts
+
+    def export(self, lines, path):
+        """
+        Like analyze(), but also writes every line as a (timestamp, level,
+        message) record to a Parquet file in the same pass. Records need a
+        parser, so the format is detected when none was given; lines no
+        parser understands keep the whole line as message and no timestamp
+        """
+        if self.log_format is None:
+            self.log_format = "auto"
+        with ParquetExporter(path) as exporter:
+            for line, record in self.records(lines):
+                if record is None:
+                    exporter.add(None, "UNKNOWN", line.rstrip("\n"))
+                    self.count("UNKNOWN")
+                    continue
+                exporter.add(record.timestamp, record.level, record.text(line))
+                self.count(record.level)
 
         return self.counts
 
@@ -41,14 +122,32 @@ def main():
     """
     Main Function as a single entrypoint to the program
     """
-    analyzer = LogAnalyzer("app.log")
-    lines = analyzer.read_logs()
+    parser = argparse.ArgumentParser(description="Day 05 log analyzer")
+    parser.add_argument("log_file", nargs="?", default="app.log", help="Log file, - for stdin")
+    parser.add_argument("--format", choices=["auto", *PARSERS],
+                        help="Parse a log format instead of searching for keywords")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Print the parse throughput of every format and exit")
+    parser.add_argument("--export", choices=["parquet"],
+                        help="Also save the parsed records, query them with log_store.py query")
+    parser.add_argument("--export-path", help="Where to write the export (default: <log file>.parquet)")
+    args = parser.parse_args()
 
-    if not lines:
-        print("No logs to analyze.")
+    if args.benchmark:
+        benchmark()
         return
 
-    result = analyzer.analyze(lines)
+    analyzer = LogAnalyzer(args.log_file, args.format)
+    if args.export:
+        path = args.export_path or ("stdin" if args.log_file == "-" else args.log_file) + ".parquet"
+        result = analyzer.export(analyzer.read_logs(), path)
+        print("Records written to", path)
+    else:
+        result = analyzer.analyze(analyzer.read_logs())
+
+    if not any(result.values()):
+        print("No logs to analyze.")
+        return
 
     print("Log Analysis Summary:")
     for level, count in result.items():
@@ -1,34 +1,996 @@
 import argparse
+import bisect
+import bz2
+import ctypes
+import ctypes.util
+import gzip
+import hashlib
+import heapq
+import io
+import json
+import lzma
+import math
+import mmap
+import os
+import re
+import select
 import sys
-from collections import Counter
+import time
+from array import array
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from functools import lru_cache
+from itertools import islice, repeat
 
-def parse_log(file_path: str) -> Counter:
+# Size of the slices scanned at once by the mmap engine.
+WINDOW_SIZE = 1024 * 1024
+# Amount of text read and classified at a time by the line readers.
+BLOCK_SIZE = 1024 * 1024
+# inotify events on the log directory that may mean new data or a rotation.
+IN_MODIFY, IN_MOVED_FROM, IN_MOVED_TO, IN_CREATE, IN_DELETE = 0x2, 0x40, 0x80, 0x100, 0x200
+LEVELS = ("INFO", "WARNING", "ERROR")
+BUCKET_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+COMPRESSED_SUFFIXES = (".gz", ".bz2", ".xz", ".zst")
+# 2**HLL_PRECISION one-byte registers per distinct-count sketch (16 KiB, ~0.8% error).
+HLL_PRECISION = 14
+# Precision of the sketch of every --bucket time bucket (1 KiB, ~3.3% error):
+# a month of 1m buckets then takes ~44 MB per field instead of ~700 MB.
+BUCKET_HLL_PRECISION = 10
+# Built-in --distinct fields; the capture group (or the whole match) is the value.
+# They start with a plain literal or character class so re can scan for it
+# quickly; a leading \b or (?i) makes them several times slower.
+FIELDS = {
+    "ip": r"[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}\b",
+    "uuid": r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}",
+    "user": r"user(?<!\wuser)(?:_?id)?[=:] ?([\w@.-]+)",
+    "request_id": r"req(?<!\wreq)(?:uest)?[_-]?id[=:] ?([\w-]+)",
+}
+# Lowercase search token of each level, for str and bytes blocks.
+TOKENS = {str: [], bytes: []}
+# Matches from the first to the last occurrence of a token on one line.
+REPEAT_PATTERNS = {}
+for level in LEVELS:
+    pattern = f"{level.lower()}[^\\n]*{level.lower()}"
+    TOKENS[str].append(level.lower())
+    TOKENS[bytes].append(level.lower().encode())
+    REPEAT_PATTERNS[level.lower()] = re.compile(pattern)
+    REPEAT_PATTERNS[level.lower().encode()] = re.compile(pattern.encode())
+# Leading timestamp stripped from an ERROR line before it is masked.
+TIMESTAMP_PREFIX_RE = re.compile(r"^\d{4}-\d\d-\d\d[ T]\d\d:\d\d:\d\d(?:[.,]\d+)?(?:Z|[+-]\d\d:?\d\d)? *", re.MULTILINE)
+# Variable parts of an error message, replaced in this order to get its template.
+MASKS = (
+    (re.compile(r"\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b"), "<IP>"),
+    (re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"), "<ID>"),
+    (re.compile(r"\b(?:0x[0-9a-fA-F]+|[0-9a-fA-F]{8,})\b"), "<ID>"),
+    (re.compile(r"\d+"), "<NUM>"),
+)
+
+def count_lines_with(buf, token) -> int:
+    """Count the lines of buf (str or bytes) that contain token at least once."""
+    count = buf.count(token)
+    # A line holding the token k times was counted k times above.
+    for match in REPEAT_PATTERNS[token].finditer(buf):
+        count -= match.group().count(token) - 1
+    return count
+
+def line_end(buf, pos: int) -> int:
+    """Return the offset of the newline ending the line that holds pos."""
+    end = buf.find(b"\n" if isinstance(buf, bytes) else "\n", pos)
+    return len(buf) if end == -1 else end
+
+def lower_line_end(block, lower, pos: int) -> int:
+    """Return the offset in block of the newline ending the line that holds pos of lower.
+
+    lower() keeps every newline but can change the length of a line ('İ'
+    becomes two characters), so a non-ASCII text block is matched line by line.
+    """
+    if isinstance(block, bytes) or block.isascii():
+        return line_end(block, pos)
+    end = -1
+    for _ in range(lower.count("\n", 0, pos) + 1):
+        end = block.find("\n", end + 1)
+        if end == -1:
+            return len(block)
+    return end
+
+def find_word(buf, word, start: int) -> int:
+    """Return the offset of the first whitespace-delimited word in buf after start."""
+    pos = buf.find(word, start)
+    while pos != -1:
+        end = pos + len(word)
+        if (pos == 0 or buf[pos - 1:pos].isspace()) and (end == len(buf) or buf[end:end + 1].isspace()):
+            return pos
+        pos = buf.find(word, pos + 1)
+    return len(buf)
+
+def count_line(line: str, counts: Counter) -> None:
+    """Add the log levels found in a single line to counts.
+
+    The original per-line reader, kept as the reference classify_block is
+    checked and timed against by --benchmark.
+    """
+    line_lower = line.lower()
+    if "info" in line_lower:
+        counts["INFO"] += 1
+    if "warning" in line_lower:
+        counts["WARNING"] += 1
+    if "error" in line_lower:
+        counts["ERROR"] += 1
+    for token in line.split():
+        if token.isupper() and token not in LEVELS:
+            counts[token] += 1
+
+def classify_block(block) -> Counter:
+    """Count the log levels in a block of complete '\\n'-separated lines.
+
+    A line counts once for each of INFO/WARNING/ERROR it mentions (ignoring
+    case), and every other uppercase word counts as a level of its own. The
+    block (str or bytes) is lowercased and split once and scanned at C level
+    instead of looping over lines in Python. Keys are inserted in the order
+    they first appear, so merging blocks in file order gives the same Counter
+    as reading line by line.
+    """
+    is_bytes = isinstance(block, bytes)
+    lower = block.lower()
+    found = []
+    for index, token in enumerate(TOKENS[type(block)]):
+        n = count_lines_with(lower, token)
+        if n:
+            found.append((lower_line_end(block, lower, lower.find(token)), 0, index, LEVELS[index], n))
+    words = block.split()
+    if is_bytes and not block.isascii():
+        # bytes.isupper() ignores non-ASCII letters, so "ÉTÉ" is checked again below.
+        upper = Counter(w for w in words if w.isupper() or not w.isascii())
+    else:
+        upper = Counter(filter(type(block).isupper, words))
+    del words
+    # upper is in first-seen order, so each search can start at the previous hit.
+    pos = 0
+    for raw, n in upper.items():
+        token = raw.decode("utf-8") if is_bytes else raw
+        if token in LEVELS or not token.isupper():
+            continue
+        pos = find_word(block, raw, pos)
+        found.append((line_end(block, pos), 1, pos, token, n))
+    counts = Counter()
+    for *_, key, n in sorted(found):
+        counts[key] = n
+    return counts
+
+def decode_lines(data: bytes) -> str:
+    """Decode complete lines with the same universal newlines as the text reader."""
+    return data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+
+def iter_blocks(f, block_size: int = BLOCK_SIZE):
+    """Yield blocks of complete lines read from the text file f."""
+    pending = ""
+    while True:
+        block = f.read(block_size)
+        if not block:
+            break
+        block = pending + block
+        cut = block.rfind("\n") + 1
+        pending = block[cut:]
+        if cut:
+            yield block[:cut]
+    if pending:
+        yield pending
+
+def open_zstd(file_path: str):
+    """Open a .zst file as text with compression.zstd (3.14+) or the zstandard package."""
+    try:
+        from compression import zstd
+        return zstd.open(file_path, "rt", encoding="utf-8")
+    except ImportError:
+        pass
+    try:
+        import zstandard
+    except ImportError:
+        print("Error: reading .zst files needs Python 3.14+ or 'pip install zstandard'.", file=sys.stderr)
+        sys.exit(1)
+    reader = zstandard.ZstdDecompressor().stream_reader(open(file_path, "rb"))
+    return io.TextIOWrapper(reader, encoding="utf-8")
+
+def open_log(file_path: str):
+    """Open a plain or compressed (.gz, .bz2, .xz, .zst) log file as text."""
+    if file_path.endswith(".gz"):
+        return gzip.open(file_path, "rt", encoding="utf-8")
+    if file_path.endswith(".bz2"):
+        return bz2.open(file_path, "rt", encoding="utf-8")
+    if file_path.endswith(".xz"):
+        return lzma.open(file_path, "rt", encoding="utf-8")
+    if file_path.endswith(".zst"):
+        return open_zstd(file_path)
+    return open(file_path, "r", encoding="utf-8")
+
+def iter_mmap_windows(file_path: str, window_size: int = WINDOW_SIZE):
+    """Yield bytes slices of the memory-mapped file ending on a newline."""
+    with open(file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            size = len(mm)
+            start = 0
+            while start < size:
+                end = mm.find(b"\n", min(start + window_size, size) - 1)
+                end = size if end == -1 else end + 1
+                yield mm[start:end]
+                # Drop the scanned pages so RSS stays flat on huge files.
+                if hasattr(mm, "madvise"):
+                    page_start = start - start % mmap.PAGESIZE
+                    mm.madvise(mmap.MADV_DONTNEED, page_start, end - page_start)
+                start = end
+
+def parse_log_mmap(file_path: str) -> Counter:
+    """Count log levels by scanning the memory-mapped file as bytes.
+
+    Gives the same counts as the line-by-line reader without building a
+    string per line; only '\\n' ends a line.
+    """
+    counts = Counter()
+    for window in iter_mmap_windows(file_path):
+        counts.update(classify_block(window))
+    return counts
+
+def parse_log(file_path: str, use_mmap: bool = False) -> Counter:
     """Parse the log file and count occurrences of each log level.
 
     Returns a Counter with keys like 'INFO', 'WARNING', 'ERROR', and any other
-    levels that appear in the file.
+    levels that appear in the file. use_mmap scans the file as bytes through
+    a memory map instead of decoding every line; compressed files are always
+    decompressed as a stream.
     """
     counts = Counter()
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            for line in f:
-                line_lower = line.lower()
-                if "info" in line_lower:
-                    counts["INFO"] += 1
-                if "warning" in line_lower:
-                    counts["WARNING"] += 1
-                if "error" in line_lower:
-                    counts["ERROR"] += 1
-                # Capture any other word that looks like a level (e.g., DEBUG)
-                # Simple heuristic: split and check for uppercase words
-                for token in line.split():
-                    if token.isupper() and token not in {"INFO", "WARNING", "ERROR"}:
-                        counts[token] += 1
+        if use_mmap and not file_path.endswith(COMPRESSED_SUFFIXES):
+            return parse_log_mmap(file_path)
+        with open_log(file_path) as f:
+            for block in iter_blocks(f):
+                counts.update(classify_block(block))
     except FileNotFoundError:
         print(f"Error: Log file '{file_path}' not found.", file=sys.stderr)
         sys.exit(1)
     return counts
 
+def parse_log_lines(file_path: str) -> Counter:
+    """Count log levels one line at a time with count_line (the reference reader)."""
+    counts = Counter()
+    with open_log(file_path) as f:
+        for line in f:
+            count_line(line, counts)
+    return counts
+
+def parse_logs(file_paths: list[str], use_mmap: bool = False, workers: int = 1) -> Counter:
+    """Count log levels across several files, e.g. app.log and its rotated .gz copies.
+
+    With more than one worker every file is decompressed and counted in its
+    own process; the results are merged in the order the files were given.
+    """
+    if workers > 1 and len(file_paths) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(file_paths))) as pool:
+            results = list(pool.map(parse_log, file_paths, repeat(use_mmap)))
+    else:
+        results = [parse_log(path, use_mmap) for path in file_paths]
+    counts = Counter()
+    for partial in results:
+        counts.update(partial)
+    return counts
+
+class SpaceSaving:
+    """Approximate top-k counter in fixed memory (the Space-Saving algorithm).
+
+    At most capacity items are tracked. An unseen item takes the place of
+    the item with the lowest count and inherits that count as its error, so
+    every count is an upper bound that is at most error too high, and any
+    item seen more than total / capacity times is always tracked.
+
+    The lowest count is found with a lazy min-heap holding one (count, item)
+    entry per tracked item. Counts only grow, so an entry is at most stale
+    (too low): it is pushed back with the current count when it surfaces,
+    and an eviction costs O(log capacity) amortized instead of a full scan.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.total = 0
+        self.counts: dict[str, int] = {}
+        self.errors: dict[str, int] = {}
+        self.heap: list[tuple[int, str]] = []
+
+    def add(self, item: str, weight: int = 1, error: int = 0) -> None:
+        """Count item weight times."""
+        self.total += weight
+        if item in self.counts:
+            self.counts[item] += weight
+            self.errors[item] += error
+            return
+        if len(self.counts) >= self.capacity:
+            floor, victim = self.heap[0]
+            while self.counts[victim] != floor:
+                heapq.heapreplace(self.heap, (self.counts[victim], victim))
+                floor, victim = self.heap[0]
+            heapq.heappop(self.heap)
+            del self.counts[victim]
+            del self.errors[victim]
+            weight += floor
+            error += floor
+        self.counts[item] = weight
+        self.errors[item] = error
+        heapq.heappush(self.heap, (weight, item))
+
+    def update(self, counts: Counter) -> None:
+        """Add exact counts, e.g. those of one block, heaviest first."""
+        for item, weight in counts.most_common():
+            self.add(item, weight)
+
+    def merge(self, other: "SpaceSaving") -> None:
+        """Fold in the sketch of another file or worker."""
+        total = self.total + other.total
+        for item, weight in sorted(other.counts.items(), key=lambda kv: kv[1], reverse=True):
+            self.add(item, weight, other.errors[item])
+        self.total = total
+
+    def top(self, n: int) -> list[tuple[str, int, int]]:
+        """Return the n heaviest items as (item, count, error)."""
+        items = sorted(self.counts.items(), key=lambda kv: kv[1], reverse=True)[:n]
+        return [(item, cnt, self.errors[item]) for item, cnt in items]
+
+class HyperLogLog:
+    """Approximate distinct count in fixed memory (the HyperLogLog algorithm).
+
+    Values are hashed with blake2b rather than hash(), which is salted per
+    process, so sketches built by other workers or from other files can be
+    merged by keeping the larger of each pair of registers.
+    """
+
+    def __init__(self, precision: int = HLL_PRECISION) -> None:
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value: str) -> None:
+        """Record one value; adding it again changes nothing."""
+        h = int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+        bits = 64 - self.precision
+        rank = bits - (h & ((1 << bits) - 1)).bit_length() + 1
+        index = h >> bits
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog") -> None:
+        """Fold in the sketch of another file or worker."""
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self) -> int:
+        """Return the estimated number of distinct values added."""
+        m = len(self.registers)
+        harmonic = sum(n * 2.0 ** -rank for rank, n in Counter(self.registers).items())
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / harmonic
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate while many registers are empty.
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+def parse_field(value: str) -> tuple[str, re.Pattern]:
+    """Turn a --distinct field (a built-in name or NAME=REGEX) into (name, pattern) (argparse type)."""
+    name, sep, regex = value.partition("=")
+    if not sep:
+        if name not in FIELDS:
+            raise argparse.ArgumentTypeError(
+                f"unknown field '{name}' (use one of {', '.join(FIELDS)} or NAME=REGEX)")
+        regex = FIELDS[name]
+    try:
+        pattern = re.compile(regex)
+    except re.error as e:
+        raise argparse.ArgumentTypeError(f"invalid regex for field '{name}': {e}")
+    if pattern.groups > 1:
+        raise argparse.ArgumentTypeError(f"regex for field '{name}' may have at most one group")
+    return name, pattern
+
+def lines_with(block: str, token: str) -> list[str]:
+    """Return the lines of block that mention the lowercase token in any case."""
+    lower = block.lower()
+    if len(lower) != len(block):
+        # A few non-ASCII letters change length when lowercased.
+        lower = "".join(c if len(c.lower()) != 1 else c.lower() for c in block)
+    lines = []
+    pos = lower.find(token)
+    while pos != -1:
+        start = lower.rfind("\n", 0, pos) + 1
+        end = line_end(lower, pos)
+        lines.append(block[start:end])
+        pos = lower.find(token, end)
+    return lines
+
+def error_templates(block: str) -> Counter:
+    """Count the templates of the ERROR lines of a block of complete lines.
+
+    A line is an ERROR line when it mentions 'error' in any case, as in
+    classify_block. The lines are masked together as one string, dropping
+    the leading timestamp and turning IPs, UUIDs, hex IDs and numbers into
+    <IP>, <ID> and <NUM>.
+    """
+    lines = lines_with(block, "error")
+    if not lines:
+        return Counter()
+    text = TIMESTAMP_PREFIX_RE.sub("", "\n".join(lines))
+    for pattern, mask in MASKS:
+        text = pattern.sub(mask, text)
+    return Counter(text.split("\n"))
+
+def add_distinct(sketches: dict[str, HyperLogLog], block: str, fields: list, level: str | None = None,
+                 precision: int = HLL_PRECISION) -> None:
+    """Feed the field values found in block (only in lines of level, if given) to sketches.
+
+    Missing sketches are created with the given precision.
+    """
+    if level is not None:
+        block = "\n".join(lines_with(block, level.lower()))
+    for name, pattern in fields:
+        sketch = sketches.get(name)
+        if sketch is None:
+            sketch = sketches[name] = HyperLogLog(precision)
+        # A value repeated within the block only needs hashing once.
+        for value in set(pattern.findall(block)):
+            sketch.add(value)
+
+def parse_log_stats(file_path: str, capacity: int = 0, fields: list = (),
+                    level: str | None = None) -> tuple[Counter, SpaceSaving, dict[str, HyperLogLog]]:
+    """Count log levels like parse_log and, in the same pass, the extra statistics.
+
+    capacity > 0 keeps the top error templates in a SpaceSaving sketch of
+    that size; every (name, pattern) of fields gets a HyperLogLog of its
+    distinct values, taken from lines of level only if one is given.
+    Memory stays fixed however large the file is: one block of text plus
+    the sketches.
+    """
+    counts = Counter()
+    errors = SpaceSaving(capacity)
+    distinct = {}
+    try:
+        with open_log(file_path) as f:
+            for block in iter_blocks(f):
+                counts.update(classify_block(block))
+                if capacity:
+                    errors.update(error_templates(block))
+                if fields:
+                    add_distinct(distinct, block, fields, level)
+    except FileNotFoundError:
+        print(f"Error: Log file '{file_path}' not found.", file=sys.stderr)
+        sys.exit(1)
+    return counts, errors, distinct
+
+def parse_logs_stats(file_paths: list[str], capacity: int = 0, fields: list = (), level: str | None = None,
+                     workers: int = 1) -> tuple[Counter, SpaceSaving, dict[str, HyperLogLog]]:
+    """parse_log_stats over several files, one per process, merged in argument order."""
+    if workers > 1 and len(file_paths) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(file_paths))) as pool:
+            results = list(pool.map(parse_log_stats, file_paths, repeat(capacity), repeat(fields), repeat(level)))
+    else:
+        results = [parse_log_stats(path, capacity, fields, level) for path in file_paths]
+    counts = Counter()
+    errors = SpaceSaving(capacity)
+    distinct = {}
+    for partial_counts, partial_errors, partial_distinct in results:
+        counts.update(partial_counts)
+        errors.merge(partial_errors)
+        for name, sketch in partial_distinct.items():
+            if name in distinct:
+                distinct[name].merge(sketch)
+            else:
+                distinct[name] = sketch
+    return counts, errors, distinct
+
+def write_distinct(distinct: dict[str, HyperLogLog], out_path: str | None) -> None:
+    """Print the estimated distinct count of every field and optionally append them to a file."""
+    rows = [f"Distinct {name}: ~{sketch.count()}" for name, sketch in distinct.items()]
+    for row in rows:
+        print(row)
+    if out_path:
+        try:
+            with open(out_path, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(row + "\n")
+        except OSError as e:
+            print(f"Error writing summary: {e}", file=sys.stderr)
+
+def write_top_errors(sketch: SpaceSaving, n: int, out_path: str | None) -> None:
+    """Print the n most frequent error templates and optionally append them to a file."""
+    rows = [f"{cnt} {template}" + (f" (+/-{error})" if error else "")
+            for template, cnt, error in sketch.top(n)]
+    print(f"Top {len(rows)} error templates:")
+    for row in rows:
+        print(f"  {row}")
+    if out_path:
+        try:
+            with open(out_path, "a", encoding="utf-8") as f:
+                f.write(f"Top {len(rows)} error templates:\n")
+                for row in rows:
+                    f.write(f"  {row}\n")
+        except OSError as e:
+            print(f"Error writing summary: {e}", file=sys.stderr)
+
+def count_complete_lines(f, pending: bytes, counts: Counter) -> bytes:
+    """Count every complete line readable from the binary file f into counts.
+
+    pending is the unfinished line left by the previous call; the new
+    unfinished tail is returned.
+    """
+    while True:
+        block = f.read(BLOCK_SIZE)
+        if not block:
+            return pending
+        block = pending + block
+        cut = block.rfind(b"\n") + 1
+        pending = block[cut:]
+        if cut:
+            counts.update(classify_block(decode_lines(block[:cut])))
+
+def parse_from_offset(file_path: str, offset: int, counts: Counter) -> int:
+    """Count the complete lines after offset into counts.
+
+    Returns the offset just past the last newline read. A trailing line that
+    is still being written is left for the next run.
+    """
+    with open(file_path, "rb") as f:
+        f.seek(offset)
+        pending = count_complete_lines(f, b"", counts)
+        return f.tell() - len(pending)
+
+def load_checkpoint(checkpoint_path: str) -> dict:
+    """Load the checkpoint file, or return an empty one if it does not exist."""
+    try:
+        with open(checkpoint_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"inode": None, "offset": 0, "counts": {}}
+
+def save_checkpoint(checkpoint_path: str, inode: int, offset: int, counts: Counter) -> None:
+    """Write the checkpoint atomically so a killed run never leaves half a file."""
+    tmp_path = checkpoint_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"inode": inode, "offset": offset, "counts": dict(counts)}, f)
+    os.replace(tmp_path, checkpoint_path)
+
+def find_rotated(file_path: str, inode: int) -> str | None:
+    """Return the rotated copy of file_path (e.g. app.log.1) that still has inode."""
+    for candidate in (file_path + ".1", file_path + ".0"):
+        try:
+            if os.stat(candidate).st_ino == inode:
+                return candidate
+        except FileNotFoundError:
+            continue
+    return None
+
+def parse_log_incremental(file_path: str, checkpoint_path: str) -> Counter:
+    """Count only the bytes appended since the last run.
+
+    The checkpoint stores the inode, the byte offset reached and the running
+    Counter. A new inode means the log was rotated: the rest of the old file
+    is read from its rotated name when it can be found, then the new file is
+    read from the start. A file smaller than the offset was truncated and is
+    also read from the start.
+    """
+    checkpoint = load_checkpoint(checkpoint_path)
+    counts = Counter(checkpoint["counts"])
+    offset = checkpoint["offset"]
+    try:
+        st = os.stat(file_path)
+    except FileNotFoundError:
+        print(f"Error: Log file '{file_path}' not found.", file=sys.stderr)
+        sys.exit(1)
+    if checkpoint["inode"] is not None and st.st_ino != checkpoint["inode"]:
+        rotated = find_rotated(file_path, checkpoint["inode"])
+        print(f"Info: '{file_path}' was rotated, starting from the beginning.", file=sys.stderr)
+        if rotated:
+            parse_from_offset(rotated, offset, counts)
+        offset = 0
+    elif st.st_size < offset:
+        print(f"Info: '{file_path}' was truncated, starting from the beginning.", file=sys.stderr)
+        offset = 0
+    if st.st_size != offset or checkpoint["inode"] != st.st_ino:
+        offset = parse_from_offset(file_path, offset, counts)
+        save_checkpoint(checkpoint_path, st.st_ino, offset, counts)
+    return counts
+
+class RollingRates:
+    """Per-level counts over the last 1, 5 and 15 minutes, kept in 1s buckets."""
+
+    WINDOWS = (60, 300, 900)
+
+    def __init__(self) -> None:
+        self.buckets: deque[tuple[int, Counter]] = deque()
+
+    def add(self, counts: Counter, now: float) -> None:
+        """Record counts seen at time now."""
+        second = int(now)
+        if self.buckets and self.buckets[-1][0] == second:
+            self.buckets[-1][1].update(counts)
+        else:
+            self.buckets.append((second, Counter(counts)))
+        while self.buckets and self.buckets[0][0] <= second - self.WINDOWS[-1]:
+            self.buckets.popleft()
+
+    def rates(self, now: float) -> dict[str, list[float]]:
+        """Return events per minute for each level over each window."""
+        second = int(now)
+        totals: dict[str, list[int]] = {}
+        for bucket_second, counts in self.buckets:
+            age = second - bucket_second
+            for level, cnt in counts.items():
+                row = totals.setdefault(level, [0] * len(self.WINDOWS))
+                for i, window in enumerate(self.WINDOWS):
+                    if age < window:
+                        row[i] += cnt
+        return {
+            level: [cnt * 60 / window for cnt, window in zip(row, self.WINDOWS)]
+            for level, row in totals.items()
+        }
+
+class InotifyWatcher:
+    """Wake up when anything changes in the directory holding the log."""
+
+    def __init__(self, file_path: str) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        # Watching the directory also reports the renames and creates of logrotate.
+        directory = os.path.dirname(os.path.abspath(file_path))
+        mask = IN_MODIFY | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+
+    def wait(self, timeout: float) -> None:
+        """Block until an event arrives or timeout seconds pass."""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if readable:
+            try:
+                while os.read(self.fd, 64 * 1024):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+class PollingWatcher:
+    """Fallback for systems without inotify: check the file every poll seconds."""
+
+    def __init__(self, poll: float = 1.0) -> None:
+        self.poll = poll
+
+    def wait(self, timeout: float) -> None:
+        time.sleep(min(timeout, self.poll))
+
+    def close(self) -> None:
+        pass
+
+def make_watcher(file_path: str):
+    """Return an inotify watcher, or a polling one when inotify is unavailable."""
+    try:
+        return InotifyWatcher(file_path)
+    except (OSError, AttributeError):
+        print("Info: inotify not available, falling back to polling.", file=sys.stderr)
+        return PollingWatcher()
+
+def print_rates(counts: Counter, rates: RollingRates, now: float) -> None:
+    """Print the running totals with their 1m/5m/15m rates (per minute)."""
+    current = rates.rates(now)
+    print(time.strftime("%Y-%m-%d %H:%M:%S"))
+    for level, cnt in counts.items():
+        one, five, fifteen = current.get(level, [0.0, 0.0, 0.0])
+        print(f"{level}: {cnt} (1m {one:.1f}/min, 5m {five:.1f}/min, 15m {fifteen:.1f}/min)")
+    sys.stdout.flush()
+
+def follow_log(file_path: str, interval: float = 10.0) -> None:
+    """Count new lines as they are written, like `tail -F`.
+
+    Reading starts at the end of the file. When the file is replaced
+    (logrotate) the old one is drained before the new one is read from the
+    start; when it shrinks (copytruncate) reading restarts at 0. Runs until
+    interrupted and prints totals and rates every interval seconds.
+    """
+    try:
+        f = open(file_path, "rb")
+    except FileNotFoundError:
+        print(f"Error: Log file '{file_path}' not found.", file=sys.stderr)
+        sys.exit(1)
+    f.seek(0, os.SEEK_END)
+    pending = b""
+    counts = Counter()
+    rates = RollingRates()
+    watcher = make_watcher(file_path)
+    next_report = time.monotonic() + interval
+    try:
+        while True:
+            watcher.wait(max(0.0, next_report - time.monotonic()))
+            new = Counter()
+            try:
+                rotated = os.stat(file_path).st_ino != os.fstat(f.fileno()).st_ino
+            except FileNotFoundError:
+                rotated = False  # between rename and create, keep reading the old file
+            if rotated:
+                pending = count_complete_lines(f, pending, new)
+                if pending:
+                    new.update(classify_block(decode_lines(pending)))
+                f.close()
+                f = open(file_path, "rb")
+                pending = b""
+            elif os.fstat(f.fileno()).st_size < f.tell():
+                f.seek(0)
+                pending = b""
+            pending = count_complete_lines(f, pending, new)
+            now = time.monotonic()
+            if new:
+                counts.update(new)
+                rates.add(new, now)
+            if now >= next_report:
+                print_rates(counts, rates, now)
+                next_report = now + interval
+    except KeyboardInterrupt:
+        print_rates(counts, rates, time.monotonic())
+    finally:
+        watcher.close()
+        f.close()
+
+def parse_bucket(value: str) -> int:
+    """Turn a bucket size like '5m' or '1h' into seconds (argparse type)."""
+    match = re.fullmatch(r"(\d+)([smhd])", value)
+    if match is None or int(match.group(1)) == 0:
+        raise argparse.ArgumentTypeError(f"invalid bucket size '{value}' (e.g. 1m, 5m, 1h)")
+    return int(match.group(1)) * BUCKET_UNITS[match.group(2)]
+
+@lru_cache(maxsize=4096)
+def day_seconds(day: str) -> int:
+    """Seconds from 0001-01-01 to the start of a 'YYYY-MM-DD' day."""
+    return date(int(day[0:4]), int(day[5:7]), int(day[8:10])).toordinal() * 86400
+
+def timestamp_seconds(line: str) -> int | None:
+    """Read the leading 'YYYY-MM-DD HH:MM:SS' of a line from fixed offsets.
+
+    Returns seconds since 0001-01-01, or None if the line has no timestamp.
+    """
+    if len(line) < 19 or line[4] != "-" or line[10] != " " or line[13] != ":" or line[16] != ":":
+        return None
+    try:
+        return day_seconds(line[:10]) + int(line[11:13]) * 3600 + int(line[14:16]) * 60 + int(line[17:19])
+    except ValueError:
+        return None
+
+class Histogram:
+    """Per-level counts per time bucket.
+
+    Only buckets with lines are stored, each as one array('I') row with a
+    column per level, so memory grows with the number of non-empty buckets,
+    not with the time span between the first and last timestamp.
+    """
+
+    def __init__(self, bucket_seconds: int, fields: list = (), level: str | None = None) -> None:
+        self.bucket_seconds = bucket_seconds
+        self.levels: dict[str, int] = {}  # level -> its column, in first-seen order
+        self.buckets: dict[int, array] = {}  # bucket -> counts per column
+        # --distinct fields (from lines of level only, if given) and their sketches per bucket.
+        self.fields = fields
+        self.level = level
+        self.distinct: dict[int, dict[str, HyperLogLog]] = {}
+
+    def add_lines(self, seconds: int, text: str) -> None:
+        """Count a run of lines that all belong to the bucket holding seconds."""
+        self.add(seconds, classify_block(text))
+        if self.fields:
+            sketches = self.distinct.setdefault(seconds // self.bucket_seconds, {})
+            add_distinct(sketches, text, self.fields, self.level, BUCKET_HLL_PRECISION)
+
+    def add(self, seconds: int, counts: Counter) -> None:
+        """Add counts to the bucket holding the given timestamp."""
+        bucket = seconds // self.bucket_seconds
+        row = self.buckets.get(bucket)
+        if row is None:
+            row = self.buckets[bucket] = array("I", [0]) * len(self.levels)
+        for level, cnt in counts.items():
+            column = self.levels.setdefault(level, len(self.levels))
+            if column >= len(row):
+                row.extend(array("I", [0]) * (column + 1 - len(row)))
+            row[column] += cnt
+
+    def rows(self, level: str | None = None):
+        """Yield (bucket start in seconds, Counter) for each non-empty bucket in time order."""
+        columns = [(name, column) for name, column in self.levels.items() if level is None or name == level]
+        for bucket in sorted(self.buckets):
+            row = self.buckets[bucket]
+            counts = Counter({name: row[column] for name, column in columns if column < len(row) and row[column]})
+            if counts:
+                yield bucket * self.bucket_seconds, counts
+
+def parse_log_buckets(file_path: str, histogram: Histogram) -> Histogram:
+    """Count log levels per time bucket from the leading timestamp of each line.
+
+    Consecutive lines of the same bucket are classified together, and a
+    timestamp is only parsed when the line prefix changes. Lines without a
+    timestamp (stack traces, blank lines) belong to the line before them;
+    lines before the first timestamp are skipped.
+    """
+    bucket_seconds = histogram.bucket_seconds
+    # Minute precision is enough unless buckets are counted in seconds.
+    prefix_len = 16 if bucket_seconds % 60 == 0 else 19
+    prefix = None
+    run_seconds = None
+    try:
+        with open_log(file_path) as f:
+            for block in iter_blocks(f):
+                lines = block.split("\n")
+                start = 0
+                for i, line in enumerate(lines):
+                    if line[:prefix_len] == prefix:
+                        continue
+                    seconds = timestamp_seconds(line)
+                    if seconds is None:
+                        continue
+                    prefix = line[:prefix_len]
+                    if run_seconds is not None and seconds // bucket_seconds == run_seconds // bucket_seconds:
+                        continue
+                    if run_seconds is not None and i > start:
+                        histogram.add_lines(run_seconds, "\n".join(lines[start:i]))
+                    start, run_seconds = i, seconds
+                if run_seconds is not None:
+                    histogram.add_lines(run_seconds, "\n".join(lines[start:]))
+    except FileNotFoundError:
+        print(f"Error: Log file '{file_path}' not found.", file=sys.stderr)
+        sys.exit(1)
+    return histogram
+
+def write_histogram(histogram: Histogram, out_path: str | None, level: str | None) -> None:
+    """Print one line per time bucket and optionally write them to a file."""
+    rows = []
+    for seconds, counts in histogram.rows(level.upper() if level else None):
+        day, rest = divmod(seconds, 86400)
+        label = f"{date.fromordinal(day).isoformat()} {rest // 3600:02d}:{rest % 3600 // 60:02d}"
+        if histogram.bucket_seconds % 60:
+            label += f":{rest % 60:02d}"
+        row = label + " " + " ".join(f"{name}={cnt}" for name, cnt in counts.items())
+        for name, sketch in histogram.distinct.get(seconds // histogram.bucket_seconds, {}).items():
+            row += f" {name}~{sketch.count()}"
+        rows.append(row)
+    for row in rows:
+        print(row)
+    if out_path:
+        try:
+            with open(out_path, "w", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(row + "\n")
+        except OSError as e:
+            print(f"Error writing summary: {e}", file=sys.stderr)
+
+def parse_time(value: str) -> int:
+    """Turn 'YYYY-MM-DD[ HH:MM[:SS]]' into seconds since 0001-01-01 (argparse type)."""
+    value = value.replace("T", " ")
+    padded = value + " 00:00:00"[len(value) - 10:] if 10 <= len(value) < 19 else value
+    seconds = timestamp_seconds(padded) if len(padded) == 19 else None
+    if seconds is None:
+        raise argparse.ArgumentTypeError(f"invalid time '{value}' (e.g. 2025-12-27 10:05)")
+    return seconds
+
+def block_times(text: str, carry: int | None) -> tuple[int | None, int | None]:
+    """Return the timestamps in effect for the first and last line of a block.
+
+    A line without a timestamp belongs to the line before it, so a block
+    that starts with one inherits carry (the last timestamp of the block
+    before). None means the line comes before any timestamp in the file.
+    """
+    first = timestamp_seconds(text[:19])
+    if first is None:
+        first = carry
+    last = None
+    end = len(text) - 1  # text ends with a newline
+    while end > 0 and last is None:
+        start = text.rfind("\n", 0, end) + 1
+        last = timestamp_seconds(text[start:start + 19])
+        end = start - 1
+    return first, first if last is None else last
+
+def load_index(index_path: str) -> dict:
+    """Load the index sidecar, or return an empty one if it is missing or unreadable."""
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {"inode": None, "offset": 0, "blocks": []}
+
+def update_index(file_path: str, index_path: str) -> dict:
+    """Bring the index sidecar of file_path up to date and return it.
+
+    The index holds one entry per block of about BLOCK_SIZE bytes of
+    complete lines: [start offset, end offset, first timestamp, last
+    timestamp, level counts]. Only bytes appended since the last update are
+    read; the last block is re-read when it is still short, so a log that
+    grows a little at a time does not end up with many tiny blocks. A new
+    inode or a smaller file means rotation or truncation, and the index is
+    rebuilt. A trailing line that is still being written is left for the
+    next update.
+    """
+    index = load_index(index_path)
+    try:
+        st = os.stat(file_path)
+    except FileNotFoundError:
+        print(f"Error: Log file '{file_path}' not found.", file=sys.stderr)
+        sys.exit(1)
+    if index["inode"] != st.st_ino or st.st_size < index["offset"]:
+        index = {"inode": st.st_ino, "offset": 0, "blocks": []}
+    blocks = index["blocks"]
+    if st.st_size == index["offset"] and index["offset"]:
+        return index
+    if blocks and blocks[-1][1] - blocks[-1][0] < BLOCK_SIZE:
+        index["offset"] = blocks.pop()[0]
+    offset = index["offset"]
+    carry = blocks[-1][3] if blocks else None
+    with open(file_path, "rb") as f:
+        f.seek(offset)
+        pending = b""
+        while True:
+            data = f.read(BLOCK_SIZE)
+            if not data:
+                break
+            data = pending + data
+            cut = data.rfind(b"\n") + 1
+            pending = data[cut:]
+            if not cut:
+                continue
+            text = decode_lines(data[:cut])
+            first, last = block_times(text, carry)
+            blocks.append([offset, offset + cut, first, last, dict(classify_block(text))])
+            offset += cut
+            carry = last
+    index["offset"] = offset
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, index_path)
+    return index
+
+def count_range(file_path: str, start: int, end: int, carry: int | None,
+                since: int | None, until: int | None) -> Counter:
+    """Count the lines of one indexed block whose timestamp is in [since, until)."""
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        text = decode_lines(f.read(end - start))
+    selected = []
+    seconds = carry
+    for line in text.split("\n"):
+        seconds = timestamp_seconds(line) or seconds
+        if seconds is not None and (since is None or seconds >= since) and (until is None or seconds < until):
+            selected.append(line)
+    return classify_block("\n".join(selected))
+
+def query_index(file_path: str, index: dict, since: int | None = None,
+                until: int | None = None, level: str | None = None) -> Counter:
+    """Count log levels between since (inclusive) and until (exclusive) from the index.
+
+    The log is assumed to be written in time order, so the first block that
+    can hold since is found by binary search on the last timestamps. Blocks
+    that lie wholly inside the range add their stored counts; only the
+    blocks cut by since or until are read again. With a level, blocks whose
+    counts do not mention it are skipped without reading.
+    """
+    blocks = index["blocks"]
+    lasts = [-1 if block[3] is None else block[3] for block in blocks]
+    first_block = bisect.bisect_left(lasts, since) if since is not None else 0
+    counts = Counter()
+    for i, (start, end, first, last, block_counts) in enumerate(islice(blocks, first_block, None), first_block):
+        if until is not None and first is not None and first >= until:
+            break
+        if level is not None and level not in block_counts:
+            continue
+        if ((since is None or (first is not None and first >= since))
+                and (until is None or (last is not None and last < until))):
+            counts.update(block_counts)
+        else:
+            carry = blocks[i - 1][3] if i else None
+            counts.update(count_range(file_path, start, end, carry, since, until))
+    return counts
+
 def filter_counts(counts: Counter, level: str | None) -> Counter:
     """If a specific level is requested, return a Counter with only that level.
     Otherwise return the original Counter.
@@ -42,6 +1004,30 @@ def filter_counts(counts: Counter, level: str | None) -> Counter:
         print(f"Warning: Level '{level}' not found in log.", file=sys.stderr)
     return filtered
 
+def benchmark(file_paths: list[str]) -> None:
+    """Time the block and mmap readers against the per-line reader.
+
+    Both must give the same counts, in the same order, as count_line
+    applied to each line; the mmap engine only ends lines at '\\n', so it
+    differs on files with bare '\\r' line ends.
+    """
+    size = sum(os.path.getsize(path) for path in file_paths)
+    engines = {
+        "lines": lambda: sum((parse_log_lines(path) for path in file_paths), Counter()),
+        "text": lambda: parse_logs(file_paths),
+        "mmap": lambda: parse_logs(file_paths, use_mmap=True),
+    }
+    baseline = None
+    for name, engine in engines.items():
+        start = time.perf_counter()
+        counts = engine()
+        elapsed = time.perf_counter() - start
+        if baseline is None:
+            baseline = (counts, elapsed)
+        same = "same counts" if list(counts.items()) == list(baseline[0].items()) else "DIFFERENT counts"
+        print(f"{name}: {elapsed:.3f}s, {size / 1e6 / elapsed:.1f} MB/s, "
+              f"{baseline[1] / elapsed:.2f}x the line reader, {same}")
+
 def write_summary(counts: Counter, out_path: str | None) -> None:
     """Print the summary to stdout and optionally write to a file."""
     for level, cnt in counts.items():
@@ -56,14 +1042,82 @@ def write_summary(counts: Counter, out_path: str | None) -> None:
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="CLI log analyzer for DevOps.")
-    parser.add_argument("--file", required=True, help="Path to the log file (e.g., app.log)")
+    parser.add_argument("--file", required=True, nargs="+",
+                        help="Log files, plain or .gz/.bz2/.xz/.zst (e.g., app.log app.log.1.gz)")
     parser.add_argument("--out", help="File to write the summary (optional)")
     parser.add_argument("--level", help="Filter to a single log level (e.g., ERROR)")
+    parser.add_argument("--mmap", action="store_true",
+                        help="Scan the file as bytes through a memory map")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only parse bytes appended since the last run (for cron)")
+    parser.add_argument("--checkpoint",
+                        help="Checkpoint file for --incremental (default: <file>.checkpoint.json)")
+    parser.add_argument("--follow", action="store_true",
+                        help="Keep watching the file like `tail -F` and print rolling rates")
+    parser.add_argument("--interval", type=float, default=10.0,
+                        help="Seconds between reports in --follow mode (default: 10)")
+    parser.add_argument("--bucket", type=parse_bucket,
+                        help="Count levels per time bucket, e.g. 1m, 5m or 1h")
+    parser.add_argument("--index", action="store_true",
+                        help="Answer from a sidecar index (<file>.index.json), updated first")
+    parser.add_argument("--since", type=parse_time,
+                        help="With --index: count lines from this time on (e.g. '2025-12-27 10:00')")
+    parser.add_argument("--until", type=parse_time,
+                        help="With --index: count lines before this time (e.g. '2025-12-27 10:05')")
+    parser.add_argument("--top-errors", type=int, metavar="N",
+                        help="Also list the N most frequent error messages, with numbers/IDs/IPs masked")
+    parser.add_argument("--distinct", type=parse_field, action="append", default=[], metavar="FIELD",
+                        help="Also estimate distinct values of a field: "
+                             f"{', '.join(FIELDS)} or NAME=REGEX (repeatable; per bucket with --bucket, "
+                             "only in lines of --level if given)")
+    parser.add_argument("--workers", type=int,
+                        help="Processes used for several files (default: one per CPU)")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Time the block and mmap readers against the per-line reader, check their counts and exit")
     args = parser.parse_args()
 
-    counts = parse_log(args.file)
+    if args.benchmark:
+        benchmark(args.file)
+        return
+
+    if args.since is not None or args.until is not None:
+        args.index = True
+    if args.follow or args.incremental or args.index:
+        if len(args.file) > 1 or args.file[0].endswith(COMPRESSED_SUFFIXES):
+            parser.error("--follow, --incremental and --index need a single uncompressed --file")
+    if args.top_errors and (args.follow or args.incremental or args.index or args.bucket):
+        parser.error("--top-errors only works with a full scan of the files")
+    if args.distinct and (args.follow or args.incremental or args.index):
+        parser.error("--distinct only works with a full scan of the files")
+    if args.bucket:
+        histogram = Histogram(args.bucket, args.distinct, args.level)
+        for path in args.file:
+            parse_log_buckets(path, histogram)
+        write_histogram(histogram, args.out, args.level)
+        return
+
+    if args.follow:
+        follow_log(args.file[0], args.interval)
+        return
+    if args.index:
+        index = update_index(args.file[0], args.file[0] + ".index.json")
+        level = args.level.upper() if args.level else None
+        counts = query_index(args.file[0], index, args.since, args.until, level)
+    elif args.incremental:
+        checkpoint = args.checkpoint or args.file[0] + ".checkpoint.json"
+        counts = parse_log_incremental(args.file[0], checkpoint)
+    elif args.top_errors or args.distinct:
+        capacity = max(10 * args.top_errors, 100) if args.top_errors else 0
+        counts, errors, distinct = parse_logs_stats(args.file, capacity, args.distinct, args.level,
+                                                    args.workers or os.cpu_count() or 1)
+    else:
+        counts = parse_logs(args.file, args.mmap, args.workers or os.cpu_count() or 1)
     counts = filter_counts(counts, args.level)
     write_summary(counts, args.out)
+    if args.top_errors:
+        write_top_errors(errors, args.top_errors, args.out)
+    if args.distinct:
+        write_distinct(distinct, args.out)
 
 if __name__ == "__main__":
     main()
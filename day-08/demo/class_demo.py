@@ -3,7 +3,7 @@ import json
 class LogAnalyzer:
     def read_logs(self):
         with open("app.log","r") as f:
-            return f.readlines()
+            yield from f # stream lines instead of readlines()
 
     def analyze(self,log_count, data):
             
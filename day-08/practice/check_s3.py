@@ -0,0 +1,139 @@
+"""
+Check the S3 sync of s3_utitlites.py and the s3:// reader of log_analyzer.py
+against moto (pip install moto), nothing is sent to AWS:
+    python check_s3.py
+"""
+import gzip
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+import boto3
+from moto import mock_aws
+from log_analyzer import count_windows, iter_mmap_windows
+from s3_reader import PART_SIZE, iter_s3_windows
+from s3_utitlites import MB, AWSUtils
+
+BUCKET = "check-bucket"
+failures = []
+
+
+def check(name, ok, detail=""):
+    print(f"{'ok' if ok else 'FAILED'}: {name}{f' ({detail})' if detail else ''}")
+    if not ok:
+        failures.append(name)
+
+
+def write_log(path, size, seed):
+    """
+        Log lines of every level up to size bytes, with random ids so gzip
+        cannot shrink them much; some lines hold two levels
+    """
+    rng = random.Random(seed)
+    levels = ("INFO", "WARNING", "ERROR", "DEBUG", "INFO ERROR", "WARNING INFO")
+    with open(path, "w") as file:
+        written = 0
+        while written < size:
+            line = f"2025-12-27 10:00:{written % 60:02d} {rng.choice(levels)} request {rng.randbytes(24).hex()}\n"
+            written += file.write(line)
+
+
+def count_requests(counts):
+    """
+        Count the GetObject calls of every client created from now on,
+        split by ranged and whole-object ones
+    """
+    def before_get(params, **kwargs):
+        counts["ranged" if "Range" in params else "whole"] += 1
+
+    if boto3.DEFAULT_SESSION is None:
+        boto3.setup_default_session()
+    boto3.DEFAULT_SESSION.events.register("before-parameter-build.s3.GetObject", before_get)
+
+
+def check_sync(aws, work):
+    source = os.path.join(work, "source")
+    os.makedirs(os.path.join(source, "nested"))
+    write_log(os.path.join(source, "app.log"), 20 * MB, 1) # multipart, ETag of the parts
+    write_log(os.path.join(source, "nested", "small.log"), 100 * 1024, 2)
+
+    first = aws.sync_upload(source, BUCKET, "logs")
+    check("first upload sends every file", first["files"] == 2 and first["skipped"] == 0, first)
+    again = aws.sync_upload(source, BUCKET, "logs")
+    check("unchanged files are skipped", again["files"] == 0 and again["skipped"] == 2, again)
+
+    # Same size, new bytes and a newer mtime: only the ETag tells them apart
+    path = os.path.join(source, "nested", "small.log")
+    with open(path, "r+") as file:
+        file.write("ERROR")
+    later = time.time() + 5
+    os.utime(path, (later, later))
+    changed = aws.sync_upload(source, BUCKET, "logs")
+    check("a changed file is uploaded again", changed["files"] == 1 and changed["skipped"] == 1, changed)
+
+    aws.s3.put_object(Bucket=BUCKET, Key="logs2/other.log", Body=b"not under logs/")
+    aws.s3.put_object(Bucket=BUCKET, Key="logs/../../escaped.log", Body=b"outside")
+    target = os.path.join(work, "target")
+    down = aws.sync_download(BUCKET, target, "logs")
+    check("download gets the files under the prefix", down["files"] == 2, down)
+    check("a sibling prefix is left out", not os.path.exists(os.path.join(target, "2", "other.log")))
+    check("keys outside the folder are skipped", not os.path.exists(os.path.join(work, "escaped.log")))
+    with open(path, "rb") as local, open(os.path.join(target, "nested", "small.log"), "rb") as copy:
+        check("downloaded bytes match", local.read() == copy.read())
+    again = aws.sync_download(BUCKET, target, "logs")
+    check("a second download skips every file", again["files"] == 0 and again["skipped"] == 2, again)
+
+
+def check_reader(aws, work):
+    requests = {"ranged":0, "whole":0}
+    count_requests(requests)
+
+    plain = os.path.join(work, "plain.log")
+    write_log(plain, 3 * PART_SIZE + 12345, 3) # lines cross the part boundaries
+    aws.s3.upload_file(plain, BUCKET, "read/plain.log")
+    expected = count_windows(iter_mmap_windows(plain))
+    counts = count_windows(iter_s3_windows(f"s3://{BUCKET}/read/plain.log"))
+    check("plain object counted with ranged GETs", counts == expected and requests["ranged"] == 4,
+          f"{counts}, {requests['ranged']} ranged GETs")
+
+    # Two gzip members, like logrotate appending to a .gz, bigger than one part
+    first, second = os.path.join(work, "first.log"), os.path.join(work, "second.log")
+    write_log(first, PART_SIZE, 4)
+    write_log(second, 2 * PART_SIZE, 5)
+    both = os.path.join(work, "both.log")
+    with open(both, "wb") as out:
+        for path in (first, second):
+            with open(path, "rb") as file:
+                out.write(file.read())
+    compressed = os.path.join(work, "both.log.gz")
+    with open(compressed, "wb") as out:
+        for path in (first, second):
+            with open(path, "rb") as file:
+                out.write(gzip.compress(file.read()))
+    size = os.path.getsize(compressed)
+    aws.s3.upload_file(compressed, BUCKET, "read/both.log.gz")
+    requests["ranged"] = 0
+    expected = count_windows(iter_mmap_windows(both))
+    counts = count_windows(iter_s3_windows(f"s3://{BUCKET}/read/both.log.gz", size))
+    check("multi-member gzip counted while it streams", counts == expected and requests["ranged"] > 1,
+          f"{counts}, {size / MB:.1f} MB in {requests['ranged']} ranged GETs")
+
+
+def main():
+    with mock_aws(), tempfile.TemporaryDirectory() as work:
+        aws = AWSUtils()
+        aws.s3.create_bucket(Bucket=BUCKET)
+        check_sync(aws, work)
+        check_reader(aws, work)
+    print(f"{len(failures)} checks failed" if failures else "all checks passed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 from utilities import read_file # importing the package
 # Abstraction
 
-print(read_file("app.log"))
\ No newline at end of file
+for line in read_file("app.log"): # lines are streamed, not loaded all at once
+    print(line, end="")
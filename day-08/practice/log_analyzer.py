@@ -1,30 +1,107 @@
+import argparse
+import glob
 import json
+import mmap
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from s3_reader import is_s3_url, iter_s3_windows, list_s3_objects
+from utilities import read_file, write_json
+
+WINDOW_SIZE = 4 * 1024 * 1024 # bytes scanned at once by the mmap engine
+LEVELS = ("INFO", "WARNING", "ERROR") # checked in this order, first match wins
+S3_WORKERS = 8 # default worker processes of a batch with S3 objects, mostly waiting on the network
+
+def iter_mmap_windows(file_name, window_size=WINDOW_SIZE):
+    """Yield slices of the memory-mapped file that end on a newline."""
+    with open(file_name, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            size = len(mm)
+            start = 0
+            while start < size:
+                end = mm.find(b"\n", min(start + window_size, size) - 1)
+                end = size if end == -1 else end + 1
+                yield mm[start:end]
+                # Drop the scanned pages so RSS stays flat on huge files.
+                if hasattr(mm, "madvise"):
+                    page_start = start - start % mmap.PAGESIZE
+                    mm.madvise(mmap.MADV_DONTNEED, page_start, end - page_start)
+                start = end
+
+def count_lines_with(buf, token):
+    """Count the lines of buf that contain token at least once."""
+    count = buf.count(token)
+    # A line holding the token k times was counted k times above.
+    for match in re.finditer(token + rb"[^\n]*" + token, buf):
+        count -= match.group().count(token) - 1
+    return count
+
+def lines_with_both(buf, first, second):
+    """Return the end offsets of the lines of buf that contain both tokens."""
+    patterns = (first + rb"[^\n]*" + second + rb"[^\n]*", second + rb"[^\n]*" + first + rb"[^\n]*")
+    return {match.end() for pattern in patterns for match in re.finditer(pattern, buf)}
+
+def count_windows(windows):
+    """
+        Level counts of byte windows that end on a newline:
+        a line only counts for the first level of LEVELS it contains
+    """
+    log_count = dict.fromkeys(LEVELS, 0)
+    info, warning, error = (level.encode() for level in LEVELS)
+    for window in windows:
+        log_count["INFO"] += count_lines_with(window, info)
+        log_count["WARNING"] += count_lines_with(window, warning) - len(lines_with_both(window, info, warning))
+        earlier = lines_with_both(window, info, error) | lines_with_both(window, warning, error)
+        log_count["ERROR"] += count_lines_with(window, error) - len(earlier)
+    return log_count
 
 class LogAnalyzer: # creating class
     """
         class has 2 things
         data members (variables) & member functions (functions)
     """
-    def __init__(self,file_name,output_file):
+    def __init__(self,file_name,output_file,use_mmap=False,size=None):
         self.file_name = file_name
         self.output_file = output_file
+        self.use_mmap = use_mmap # scan bytes through a memory map instead of readlines()
+        self.size = size # bytes of an S3 object when already listed, saves a HEAD request
 
     def read_logs(self):
-        #option 2
-        with open(self.file_name,"r") as file: # file open
-            return file.readlines() # file operation
+        #option 3
+        return read_file(self.file_name) # generator, one line at a time
         
     def write_json(self,counts):
         with open(self.output_file,"w+") as json_file:
             json.dump(counts,json_file)
 
-    def analyze(self):
+    def count_mmap(self):
+        """
+            Same counts as analyze() without reading the file into a list
+        """
+        return count_windows(iter_mmap_windows(self.file_name))
+
+    def count(self, lines=None):
+        """
+            Return the level counts without writing them anywhere
+            lines can be any iterable of log lines (stdin, a gzip stream, ...)
+            by default the log file is streamed with read_logs(),
+            an s3://bucket/key file is streamed from S3 without touching the disk
+        """
+        if lines is None and is_s3_url(self.file_name):
+            return count_windows(iter_s3_windows(self.file_name, self.size))
+        if lines is None and self.use_mmap and not self.file_name.endswith(".gz"):
+            return self.count_mmap()
+
         log_count = {
             "INFO": 0,
             "WARNING":0,
             "ERROR":0
         }
-        lines = self.read_logs()
+        if lines is None:
+            lines = self.read_logs()
 
         for line in lines:
             if "INFO" in line:
@@ -35,15 +112,106 @@ class LogAnalyzer: # creating class
                 log_count.update({"ERROR": log_count["ERROR"]+1})
             else:
                 pass
+        return log_count
+
+    def analyze(self, lines=None):
+        """
+            Count the levels (see count()) and write them to output_file
+        """
+        self.write_json(self.count(lines))
+
+def expand_paths(patterns, sizes=None):
+    """
+        Turn file names, globs and directories into a list of log files
+        a directory contributes every file directly inside it
+        and s3://bucket/prefix every object under the prefix
+        (their sizes go to the sizes dict when one is given)
+    """
+    files = []
+    for pattern in patterns:
+        if is_s3_url(pattern):
+            objects = list_s3_objects(pattern)
+            if sizes is not None:
+                sizes.update(objects)
+            files.extend(objects)
+            continue
+        matches = sorted(glob.glob(pattern, recursive=True)) or [pattern]
+        for path in matches:
+            if os.path.isdir(path):
+                files.extend(sorted(entry.path for entry in os.scandir(path) if entry.is_file()))
+            else:
+                files.append(path)
+    return list(dict.fromkeys(files)) # drop duplicates, keep order
+
+def analyze_file(file_name, use_mmap=False, size=None):
+    """Worker: count one file, return (counts, seconds)."""
+    start = time.perf_counter()
+    counts = LogAnalyzer(file_name, None, use_mmap, size).count()
+    return counts, time.perf_counter() - start
+
+def analyze_batch(patterns, output_file, workers=None, use_mmap=False):
+    """
+        Count every file matched by patterns on a pool of worker processes
+        and write one JSON report with per-file and total counts.
+        The largest files are submitted first so a big file picked up
+        last does not leave the other workers idle at the end.
+        S3 objects are streamed by the workers, S3_WORKERS at a time by default.
+    """
+    sizes = {}
+    files = expand_paths(patterns, sizes)
+    for file_name in files:
+        if file_name not in sizes:
+            sizes[file_name] = os.path.getsize(file_name)
+    if workers is None and any(is_s3_url(file_name) for file_name in files):
+        workers = max(os.cpu_count() or 1, S3_WORKERS)
+    results = {}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(analyze_file, file_name, use_mmap, sizes[file_name]): file_name
+                   for file_name in sorted(files, key=sizes.get, reverse=True)}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+    elapsed = time.perf_counter() - start
+
+    total = dict.fromkeys(LEVELS, 0)
+    report = {"files": {}, "total": total}
+    for file_name in files: # report in the order the files were given
+        counts, seconds = results[file_name]
+        for level in LEVELS:
+            total[level] += counts[level]
+        report["files"][file_name] = {**counts, "bytes": sizes[file_name], "seconds": round(seconds, 4)}
+    write_json(output_file, report)
+
+    for file_name in files:
+        entry = report["files"][file_name]
+        print(f"{file_name}: {entry['bytes'] / 1e6:.1f} MB in {entry['seconds']:.3f}s")
+    total_bytes = sum(sizes.values())
+    print(f"{len(files)} files, {total_bytes / 1e6:.1f} MB in {elapsed:.3f}s "
+          f"({total_bytes / 1e6 / max(elapsed, 1e-9):.1f} MB/s)")
+    return report
 
-        self.write_json(log_count)
 
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Day 08 log analyzer")
+    parser.add_argument("paths", nargs="*",
+                        help="Log files, globs, directories or s3://bucket/prefix to analyze as one batch")
+    parser.add_argument("-o", "--output", default="report.json", help="Merged JSON report for a batch")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Worker processes for a batch (default: one per CPU)")
+    parser.add_argument("--mmap", action="store_true", help="Scan the files as bytes through a memory map")
+    args = parser.parse_args()
 
-# modular
-log_1 = LogAnalyzer("app.log","output1.json") # creating object
-log_count = log_1.analyze()
+    if args.paths:
+        local = [path for path in args.paths if not is_s3_url(path)] # S3 prefixes are listed by the batch
+        missing = [path for path in expand_paths(local) if not os.path.isfile(path)]
+        if missing:
+            parser.error(f"no such file: {', '.join(missing)}")
+        analyze_batch(args.paths, args.output, args.workers, args.mmap)
+    else:
+        # modular
+        log_1 = LogAnalyzer("app.log","output1.json",args.mmap) # creating object
+        log_count = log_1.analyze()
 
-# reusable clear # extensible
-log_1 = LogAnalyzer("app2.log","output2.json") # creating object
-log_count = log_1.analyze()
\ No newline at end of file
+        # reusable clear # extensible
+        log_1 = LogAnalyzer("app2.log","output2.json",args.mmap) # creating object
+        log_count = log_1.analyze()
\ No newline at end of file
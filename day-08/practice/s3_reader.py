@@ -0,0 +1,123 @@
+"""
+Read logs straight from S3: s3://bucket/prefix inputs for log_analyzer.py
+Objects are streamed into memory and never written to local disk
+"""
+import os
+import sys
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+PART_SIZE = 8 * 1024 * 1024 # bytes of one ranged GET
+PARALLEL_PARTS = 4 # ranged GETs of one object in flight, bounds memory to ~32 MB per object
+READ_SIZE = 4 * 1024 * 1024 # bytes read at a time from a small object / decompressed at a time
+
+_client = None # (pid, client), a client must not be shared with forked worker processes
+
+
+def is_s3_url(path):
+    return path.startswith("s3://")
+
+
+def split_s3_url(url):
+    """
+        s3://bucket/prefix -> (bucket, prefix)
+    """
+    bucket, _, prefix = url[len("s3://"):].partition("/")
+    if not is_s3_url(url) or not bucket:
+        raise ValueError(f"expected s3://bucket/prefix, got '{url}'")
+    return bucket, prefix
+
+
+def get_client():
+    """
+        S3 client of this process, AWS_ENDPOINT_URL points it at a local S3 stand-in
+    """
+    global _client
+    if _client is None or _client[0] != os.getpid():
+        try:
+            import boto3
+            from botocore.config import Config
+        except ImportError:
+            print("Error: s3:// inputs need 'pip install boto3'.", file=sys.stderr)
+            sys.exit(1)
+        _client = (os.getpid(), boto3.client("s3", config=Config(max_pool_connections=PARALLEL_PARTS * 2)))
+    return _client[1]
+
+
+def list_s3_objects(url):
+    """
+        {s3://bucket/key: size} of every object under the prefix of url
+    """
+    bucket, prefix = split_s3_url(url)
+    objects = {}
+    for page in get_client().get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", ()):
+            if not obj["Key"].endswith("/"): # folder placeholder
+                objects[f"s3://{bucket}/{obj['Key']}"] = obj["Size"]
+    return objects
+
+
+def iter_object_blocks(bucket, key, size, part_size=PART_SIZE, parallel=PARALLEL_PARTS):
+    """
+        Yield the bytes of an object in order. An object bigger than part_size
+        is fetched as ranged GETs, parallel of them in flight while the
+        caller consumes the oldest one
+    """
+    client = get_client()
+    if size <= part_size:
+        yield from client.get_object(Bucket=bucket, Key=key)["Body"].iter_chunks(READ_SIZE)
+        return
+
+    def fetch(start):
+        end = min(start + part_size, size) - 1
+        return client.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-{end}")["Body"].read()
+
+    with ThreadPoolExecutor(max_workers=parallel) as pool:
+        pending = deque()
+        for start in range(0, size, part_size):
+            if len(pending) >= parallel:
+                yield pending.popleft().result()
+            pending.append(pool.submit(fetch, start))
+        while pending:
+            yield pending.popleft().result()
+
+
+def gunzip_blocks(blocks):
+    """
+        Decompress a stream of gzip bytes on the fly, READ_SIZE bytes at
+        most at a time, concatenated gzip members included
+    """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    for block in blocks:
+        while block:
+            yield decompressor.decompress(block, READ_SIZE)
+            if decompressor.eof: # a new member starts in the rest of the block
+                block = decompressor.unused_data
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            else:
+                block = decompressor.unconsumed_tail
+    yield decompressor.flush()
+
+
+def iter_s3_windows(url, size=None):
+    """
+        Yield the bytes of an S3 object as windows that end on a newline,
+        like iter_mmap_windows() does for a local file. *.gz objects are
+        decompressed while they stream
+    """
+    bucket, key = split_s3_url(url)
+    if size is None:
+        size = get_client().head_object(Bucket=bucket, Key=key)["ContentLength"]
+    blocks = iter_object_blocks(bucket, key, size)
+    if key.endswith(".gz"):
+        blocks = gunzip_blocks(blocks)
+    carry = b""
+    for block in blocks:
+        data = carry + block if carry else block
+        cut = data.rfind(b"\n") + 1
+        if cut:
+            yield data[:cut]
+        carry = data[cut:]
+    if carry:
+        yield carry
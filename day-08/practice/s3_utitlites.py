@@ -1,14 +1,69 @@
+import argparse
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 import boto3
 import boto3.session
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from s3_reader import split_s3_url
+
+MB = 1024 * 1024
+FILE_WORKERS = 8 # files transferred at the same time
+# Parts of one big file transferred at the same time, multipart above 8 MB
+TRANSFER_CONFIG = TransferConfig(multipart_threshold=8 * MB, multipart_chunksize=8 * MB,
+                                 max_concurrency=8, use_threads=True)
+# Every file worker may run max_concurrency part transfers on the shared client
+CLIENT_CONFIG = Config(max_pool_connections=FILE_WORKERS * TRANSFER_CONFIG.max_concurrency,
+                       retries={"mode":"adaptive", "max_attempts":5})
+
+
+def local_etag(file_path, config=TRANSFER_CONFIG):
+    """
+        The ETag S3 gives a file uploaded with config: the MD5 of the file,
+        or for multipart uploads the MD5 of the part MD5s followed by -parts
+    """
+    digests = []
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(config.multipart_chunksize), b""):
+            digests.append(hashlib.md5(chunk).digest())
+    if os.path.getsize(file_path) < config.multipart_threshold:
+        return digests[0].hex() if digests else hashlib.md5(b"").hexdigest()
+    return f"{hashlib.md5(b''.join(digests)).hexdigest()}-{len(digests)}"
+
+
+def unchanged(file_path, remote, downloading=False):
+    """
+        True when the local file and the object (from list_objects_v2) hold
+        the same bytes: sizes must match, then the newer copy being on the
+        destination side is enough, else the ETags decide
+    """
+    stat = os.stat(file_path)
+    if stat.st_size != remote["Size"]:
+        return False
+    remote_mtime = remote["LastModified"].timestamp()
+    if (stat.st_mtime >= remote_mtime) if downloading else (remote_mtime >= stat.st_mtime):
+        return True
+    return local_etag(file_path) == remote["ETag"].strip('"')
+
+
+def folder_prefix(prefix):
+    """
+        Treat a non-empty prefix as a folder like aws s3 sync does:
+        logs -> logs/, so logs2/... is not part of it
+    """
+    return prefix + "/" if prefix and not prefix.endswith("/") else prefix
+
 
 class AWSUtils:
-    def __init__(self):
+    def __init__(self, endpoint_url=None):
+        self.endpoint_url = endpoint_url # e.g. a local S3 stand-in such as MinIO
         self.s3 = self.get_connection("s3")
         self.ec2 = self.get_connection("ec2")
 
     def get_connection(self,service):
-        boto3.session(access="ADSLDNASKLJND")
-        return boto3.client(service) # creating a client for S3 so that it can call APIs
+        return boto3.client(service, endpoint_url=self.endpoint_url, config=CLIENT_CONFIG) # creating a client for S3 so that it can call APIs
 
     def show_buckets(self):
         response = self.s3.list_buckets()
@@ -19,7 +74,7 @@ class AWSUtils:
     def create_bucket(self, bucket_name):
         try:
             response = self.s3.create_bucket(
-                Bucket=bucket_name, 
+                Bucket=bucket_name,
                 CreateBucketConfiguration={
                 'LocationConstraint': 'us-west-2',
             },)
@@ -30,19 +85,125 @@ class AWSUtils:
 
         except:
             print("Error occured")
-        
+
     def show_regions(self):
         response = self.ec2.describe_regions()
 
     def upload_to_bucket(self, file_path,bucket_name,key_name):
-        self.s3.upload_file(file_path,bucket_name,key_name)
+        self.s3.upload_file(file_path,bucket_name,key_name, Config=TRANSFER_CONFIG)
         print("File uploaded successfully")
 
+    def list_objects(self, bucket_name, prefix=""):
+        """
+            {key: object} of every object under prefix
+        """
+        objects = {}
+        for page in self.s3.get_paginator("list_objects_v2").paginate(Bucket=bucket_name, Prefix=prefix):
+            for obj in page.get("Contents", ()):
+                objects[obj["Key"]] = obj
+        return objects
+
+    def sync_upload(self, local_dir, bucket_name, prefix="", workers=FILE_WORKERS):
+        """
+            Upload every file under local_dir to bucket_name/prefix,
+            skipping the files the bucket already holds unchanged
+        """
+        prefix = folder_prefix(prefix)
+        remote = self.list_objects(bucket_name, prefix)
+        transfers = []
+        skipped = 0
+        for root, _, files in os.walk(local_dir):
+            for name in files:
+                file_path = os.path.join(root, name)
+                key = prefix + os.path.relpath(file_path, local_dir).replace(os.sep, "/")
+                if key in remote and unchanged(file_path, remote[key]):
+                    skipped += 1
+                else:
+                    transfers.append((file_path, key))
+        transfers.sort(key=lambda transfer: os.path.getsize(transfer[0]), reverse=True)
+
+        def upload(transfer):
+            file_path, key = transfer
+            self.s3.upload_file(file_path, bucket_name, key, Config=TRANSFER_CONFIG)
+            return os.path.getsize(file_path)
+
+        return self.run_transfers("Uploaded", upload, transfers, skipped, workers)
+
+    def sync_download(self, bucket_name, local_dir, prefix="", workers=FILE_WORKERS):
+        """
+            Download every object under bucket_name/prefix into local_dir,
+            skipping the files that are already there unchanged
+        """
+        prefix = folder_prefix(prefix)
+        root = os.path.realpath(local_dir)
+        transfers = []
+        skipped = 0
+        for key, obj in self.list_objects(bucket_name, prefix).items():
+            if key.endswith("/"): # folder placeholder
+                continue
+            file_path = os.path.realpath(os.path.join(root, *key[len(prefix):].split("/")))
+            if os.path.commonpath([root, file_path]) != root or file_path == root:
+                print(f"Skipping {key}: it would be written outside {local_dir}")
+                continue
+            if os.path.exists(file_path) and unchanged(file_path, obj, downloading=True):
+                skipped += 1
+            else:
+                transfers.append((file_path, key, obj))
+        transfers.sort(key=lambda transfer: transfer[2]["Size"], reverse=True)
+
+        def download(transfer):
+            file_path, key, obj = transfer
+            os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+            self.s3.download_file(bucket_name, key, file_path, Config=TRANSFER_CONFIG)
+            # The object's time, so the next sync skips it on the mtime check
+            mtime = obj["LastModified"].timestamp()
+            os.utime(file_path, (mtime, mtime))
+            return obj["Size"]
+
+        return self.run_transfers("Downloaded", download, transfers, skipped, workers)
+
+    def run_transfers(self, action, transfer, transfers, skipped, workers):
+        """
+            Run transfer() for several files at the same time (the callers
+            sort them biggest first) and print the throughput
+        """
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            total = sum(pool.map(transfer, transfers))
+        seconds = time.perf_counter() - start
+        speed = total / MB / seconds if seconds else 0
+        print(f"{action} {len(transfers)} files ({total / MB:.1f} MB) in {seconds:.2f}s "
+              f"({speed:.1f} MB/s), {skipped} unchanged files skipped")
+        return {"files":len(transfers), "skipped":skipped, "bytes":total,
+                "seconds":round(seconds, 3), "mb_per_second":round(speed, 1)}
+
+
 print("Start")
 if __name__ == "__main__": # ye file ka jo execution hoga vo if confition ke andar hoga
     print("Enter")
-    aws = AWSUtils()
+    parser = argparse.ArgumentParser(description="S3 utilities, no arguments lists the buckets")
+    parser.add_argument("command", nargs="?", choices=("upload", "download"),
+                        help="upload: SOURCE dir to DEST s3://bucket/prefix, download: the other way")
+    parser.add_argument("source", nargs="?")
+    parser.add_argument("dest", nargs="?")
+    parser.add_argument("-w", "--workers", type=int, default=FILE_WORKERS, help="Files transferred at the same time")
+    parser.add_argument("--endpoint-url", help="S3 endpoint, e.g. http://localhost:9000 for a local stand-in")
+    args = parser.parse_args()
+    if args.command and not (args.source and args.dest):
+        parser.error(f"{args.command} needs SOURCE and DEST")
+    if args.command:
+        try:
+            bucket, prefix = split_s3_url(args.dest if args.command == "upload" else args.source)
+        except ValueError as e:
+            parser.error(str(e))
+
+    aws = AWSUtils(args.endpoint_url)
     print("hello from AWS Class wali file")
-    aws.show_buckets()
+    if args.command == "upload":
+        aws.sync_upload(args.source, bucket, prefix, workers=args.workers)
+    elif args.command == "download":
+        aws.sync_download(bucket, args.dest, prefix, workers=args.workers)
+    else:
+        aws.show_buckets()
 
-print("Exit")
\ No newline at end of file
+print("Exit")
@@ -3,11 +3,26 @@ Packages:
  are python functions that can be imported 
  in some other code file
 """
+import gzip
 import json
+import sys
+
+BUFFER_SIZE = 1024 * 1024 # bytes read from disk at a time
 
 def read_file(filename):
-    with open(filename, "r") as file:
-        return file.readlines()
+    """
+        Generator: yields one line at a time, so a big file never sits in memory
+        "-" reads from stdin and *.gz files are decompressed on the fly
+    """
+    if filename == "-":
+        yield from sys.stdin
+        return
+    if filename.endswith(".gz"):
+        file = gzip.open(filename, "rt")
+    else:
+        file = open(filename, "r", buffering=BUFFER_SIZE)
+    with file:
+        yield from file
     
 def write_json(filename,json_object):
     with open(filename, "w+") as file:
@@ -1,13 +1,32 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI # Importing FastAPI Class
-from routers import metrics, aws
+from routers import metrics, aws, logs
+from services.log_service import get_process_pool, shutdown_process_pool
+from services.metrics_service import run_sampler, run_process_sampler
+from services.prometheus_service import LatencyMiddleware
+
+@asynccontextmanager
+async def lifespan(app):
+    """
+    Runs the background metrics samplers and the log counting processes while the app is up
+    """
+    get_process_pool()
+    samplers = [asyncio.create_task(run_sampler()), asyncio.create_task(run_process_sampler())]
+    yield
+    for sampler in samplers:
+        sampler.cancel()
+    shutdown_process_pool()
 
 app = FastAPI(
     title="Internal DevOps Utilities API",
     description="This is an Internal API Utitlities App for Monitoring metrics, AWS Usage, Log Analysis, etc",
     version="1.1.0",
     doc_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
+app.add_middleware(LatencyMiddleware) # request latency histograms for /metrics/prometheus
 
 @app.get("/")
 def hello():
@@ -17,4 +36,5 @@ def hello():
     return {"message":"Hello Dosto, This is DevOps Utilites API"}
 
 app.include_router(metrics.router)
-app.include_router(aws.router, prefix="/aws")
\ No newline at end of file
+app.include_router(aws.router, prefix="/aws")
+app.include_router(logs.router, prefix="/logs")
\ No newline at end of file
@@ -0,0 +1,140 @@
+# Benchmark: /aws endpoints cold vs warm, against moto (default) or a real account
+import argparse
+import contextlib
+import os
+import statistics
+import time
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def describe(latencies):
+    latencies = sorted(latencies)
+    return (f"{len(latencies)} calls, median {statistics.median(latencies) * 1000:.3f} ms, "
+            f"max {latencies[-1] * 1000:.3f} ms")
+
+
+def bench_s3(aws_service, calls):
+    cold, info = timed(aws_service.get_bucket_info)
+    print(f"s3 cold ({info['total_buckets']} buckets): {cold * 1000:.1f} ms")
+    print(f"s3 warm: {describe([timed(aws_service.get_bucket_info)[0] for _ in range(calls)])}")
+    # Past the TTL: the stale inventory is served while one thread reloads it
+    # and every further stale call must not wait for that reload either
+    aws_service.bucket_inventory.loaded_at -= aws_service.bucket_inventory.ttl
+    stale = [timed(aws_service.get_bucket_info)[0] for _ in range(20)]
+    time.sleep(cold * 2 + 0.1)
+    print(f"s3 stale-while-revalidate: {describe(stale)}, "
+          f"reloaded in the background: {aws_service.bucket_inventory.age() < aws_service.bucket_inventory.ttl}")
+
+
+def add_latency(aws_service, service, delay):
+    """
+        Sleep delay(region) seconds before every call of service,
+        a stand-in for the network when moto answers in process
+    """
+    import boto3
+    if boto3.DEFAULT_SESSION is None:
+        boto3.setup_default_session()
+    boto3.DEFAULT_SESSION.events.register(
+        f"before-call.{service}", lambda request_signer, **kwargs: time.sleep(delay(request_signer.region_name)))
+    aws_service._clients.clear()
+
+
+def bench_s3_details(aws_service, workers, latency):
+    """
+        Enrich every bucket with 1 worker and with workers threads,
+        latency seconds are added to every S3 call to stand in for the network
+    """
+    if latency:
+        add_latency(aws_service, "s3", lambda region: latency)
+    serial, details = timed(aws_service.load_bucket_details, 1)
+    parallel, _ = timed(aws_service.load_bucket_details, workers)
+    calls = sum(3 for bucket in details) # location, one listing page, lifecycle
+    print(f"s3 details, {len(details)} buckets, {latency * 1000:.0f} ms per call: 1 worker {serial:.2f}s, "
+          f"{workers} workers {parallel:.2f}s (bound: {calls / workers * latency:.2f}s)")
+    # The largest bucket, bench-bucket-00000 on moto; buckets that failed have no size
+    largest = max(details, key=lambda bucket: bucket.get("size_bytes", -1), default=None)
+    if largest is not None:
+        print(f"s3 details sample (largest bucket): {largest}")
+
+
+def bench_ec2(aws_service, latency):
+    """
+        Every region alone, then all regions at once; regions get
+        different delays, from latency to 5 x latency seconds per call
+    """
+    regions = aws_service.list_regions()
+    delays = {region: latency * (1 + index % 5) for index, region in enumerate(regions)}
+    if latency:
+        add_latency(aws_service, "ec2", lambda region: delays.get(region, latency))
+    aws_service.load_instance_inventory() # creates and caches the client of every region
+    single = {region: timed(aws_service.describe_region_instances, region)[0] for region in regions}
+    slowest = max(single, key=single.get)
+    parallel, inventory = timed(aws_service.load_instance_inventory)
+    instances = sum(region.get("instances", 0) for region in inventory.values())
+    print(f"ec2 {len(regions)} regions, {instances} instances: one by one {sum(single.values()):.2f}s, "
+          f"in parallel {parallel:.2f}s, slowest region alone ({slowest}) {single[slowest]:.2f}s")
+    print(f"ec2 by state / type: {aws_service.get_instance_info()['by_state']} "
+          f"{aws_service.get_instance_info()['by_type']}")
+
+
+def create_instances():
+    import boto3
+    for region, count, instance_type in (("us-east-1", 3, "t3.micro"), ("eu-west-1", 2, "m5.large"),
+                                          ("ap-south-1", 1, "t3.micro")):
+        ec2 = boto3.client("ec2", region_name=region)
+        image = ec2.describe_images(Owners=["amazon"])["Images"][0]["ImageId"]
+        instance_ids = [instance["InstanceId"] for instance in ec2.run_instances(
+            ImageId=image, MinCount=count, MaxCount=count, InstanceType=instance_type)["Instances"]]
+        if region == "eu-west-1":
+            ec2.stop_instances(InstanceIds=instance_ids[:1])
+
+
+def create_buckets(count):
+    import boto3
+    s3 = boto3.client("s3", region_name="us-east-1")
+    for index in range(count):
+        s3.create_bucket(Bucket=f"bench-bucket-{index:05d}")
+    for key in range(3):
+        s3.put_object(Bucket="bench-bucket-00000", Key=f"object-{key}", Body=b"x" * 1000)
+    s3.put_bucket_lifecycle_configuration(Bucket="bench-bucket-00000", LifecycleConfiguration={"Rules":[
+        {"ID":"expire", "Status":"Enabled", "Filter":{"Prefix":""}, "Expiration":{"Days":30}}]})
+
+
+def main():
+    """
+        python bench_aws.py [--buckets 500] [--live]
+    """
+    parser = argparse.ArgumentParser(description="Benchmark for the /aws services")
+    parser.add_argument("--buckets", type=int, default=500, help="Buckets created in moto")
+    parser.add_argument("--calls", type=int, default=1000, help="Warm calls to time")
+    parser.add_argument("--workers", type=int, default=32, help="Threads enriching buckets")
+    parser.add_argument("--latency-ms", type=float, default=20,
+                        help="Delay added to every S3 call in moto to stand in for the network")
+    parser.add_argument("--live", action="store_true",
+                        help="Use the configured AWS account instead of moto (read only)")
+    args = parser.parse_args()
+
+    if args.live:
+        mock = contextlib.nullcontext()
+    else:
+        from moto import mock_aws
+        os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+        mock = mock_aws()
+    with mock:
+        if not args.live:
+            create_buckets(args.buckets)
+            create_instances()
+        from services import aws_service
+        latency = 0 if args.live else args.latency_ms / 1000
+        bench_s3(aws_service, args.calls)
+        bench_s3_details(aws_service, args.workers, latency)
+        bench_ec2(aws_service, latency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# Benchmark: render time of /metrics/prometheus, in process and over HTTP
+import argparse
+import asyncio
+import statistics
+import time
+
+from services.prometheus_service import refresh_system_metrics, render, request_latency
+
+
+def describe(latencies, what="renders"):
+    latencies = sorted(latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1] if len(latencies) >= 100 else latencies[-1]
+    return (f"{len(latencies)} {what}, median {statistics.median(latencies) * 1e6:.0f} us, "
+            f"p99 {p99 * 1e6:.0f} us, max {latencies[-1] * 1e6:.0f} us")
+
+
+def bench_render(renders, routes, changed):
+    """
+        Time render() with routes x 3 status latency series recorded,
+        changed of them getting a new request before every render
+    """
+    series = [("GET", f"/bench/{route}", status) for route in range(routes) for status in (200, 400, 500)]
+    for labels in series:
+        for seconds in (0.001, 0.02, 0.3, 4.0):
+            request_latency.observe(labels, seconds)
+    changed = len(series) if changed is None else min(changed, len(series))
+    start = time.perf_counter()
+    refresh_system_metrics()
+    print(f"refresh_system_metrics (background sampler, once per interval): "
+          f"{(time.perf_counter() - start) * 1000:.2f} ms")
+    text = render()
+    latencies = []
+    for index in range(renders):
+        for offset in range(changed):
+            request_latency.observe(series[(index + offset) % len(series)], 0.01)
+        start = time.perf_counter()
+        render()
+        latencies.append(time.perf_counter() - start)
+    print(f"render, {len(text.splitlines())} lines / {len(text) / 1024:.0f} KB, "
+          f"{changed} of {len(series)} series changed: {describe(latencies)}")
+
+
+async def scrape(client, url, seconds):
+    """
+        One scraper: GET /metrics/prometheus once per second
+    """
+    latencies = []
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        response = await client.get(url + "/metrics/prometheus")
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(max(0.0, 1 - (time.perf_counter() - start)))
+    return latencies
+
+
+async def bench_http(url, scrapers, seconds):
+    import httpx
+    async with httpx.AsyncClient(timeout=None) as client:
+        results = await asyncio.gather(*(scrape(client, url, seconds) for _ in range(scrapers)))
+    print(f"{scrapers} scrapers at 1/s over HTTP (round trip): {describe(sum(results, []), 'scrapes')}")
+
+
+def main():
+    """
+        python bench_prometheus.py [--url http://127.0.0.1:8000 --scrapers 5]
+    """
+    parser = argparse.ArgumentParser(description="Benchmark for /metrics/prometheus")
+    parser.add_argument("--renders", type=int, default=10000, help="In-process renders to time")
+    parser.add_argument("--routes", type=int, default=20, help="Routes with recorded latencies")
+    parser.add_argument("--url", help="Also scrape a running server (needs httpx)")
+    parser.add_argument("--changed", type=int,
+                        help="Series getting a request between two renders (default: all)")
+    parser.add_argument("--scrapers", type=int, default=5, help="Concurrent scrapers with --url")
+    parser.add_argument("--seconds", type=int, default=10, help="Scrape duration with --url")
+    args = parser.parse_args()
+    bench_render(args.renders, args.routes, args.changed)
+    if args.url:
+        asyncio.run(bench_http(args.url, args.scrapers, args.seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# Load test: concurrent streamed uploads to /logs/analyze while polling other endpoints
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+LINES = (
+    b"2025-01-10 09:00:01 INFO Application started successfully\n",
+    b"2025-01-10 09:00:05 WARNING Disk usage above 80%\n",
+    b"2025-01-10 09:00:07 ERROR Database timeout occurred\n",
+    b"2025-01-10 09:00:09 DEBUG Cache warmed in 120ms\n",
+)
+CHUNK = b"".join(LINES) * 16384 # ~3 MB of log lines sent per chunk
+
+
+async def log_body(size):
+    """
+        Generate size bytes of log lines without holding them in memory
+    """
+    sent = 0
+    while sent < size:
+        chunk = CHUNK[:size - sent]
+        sent += len(chunk)
+        yield chunk
+
+
+async def upload(client, url, size):
+    start = time.perf_counter()
+    response = await client.post(url + "/logs/analyze", content=log_body(size))
+    response.raise_for_status()
+    return time.perf_counter() - start, response.json()
+
+
+async def poll(client, url, path, stop):
+    """
+        Request path again and again until stop is set, return the latencies
+    """
+    latencies = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = await client.get(url + path)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(0.05)
+    return latencies
+
+
+def describe(latencies):
+    if not latencies:
+        return "no requests"
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) >= 20 else latencies[-1]
+    return (f"{len(latencies)} requests, median {statistics.median(latencies) * 1000:.0f} ms, "
+            f"p95 {p95 * 1000:.0f} ms, max {latencies[-1] * 1000:.0f} ms")
+
+
+async def run(url, uploads, size_mb, paths):
+    size = size_mb * 1024 * 1024
+    async with httpx.AsyncClient(timeout=None) as client:
+        # Baseline latency with no uploads running
+        stop = asyncio.Event()
+        pollers = [asyncio.create_task(poll(client, url, path, stop)) for path in paths]
+        await asyncio.sleep(3)
+        stop.set()
+        for path, latencies in zip(paths, await asyncio.gather(*pollers)):
+            print(f"idle   {path}: {describe(latencies)}")
+
+        stop = asyncio.Event()
+        pollers = [asyncio.create_task(poll(client, url, path, stop)) for path in paths]
+        start = time.perf_counter()
+        results = await asyncio.gather(*(upload(client, url, size) for _ in range(uploads)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        for path, latencies in zip(paths, await asyncio.gather(*pollers)):
+            print(f"loaded {path}: {describe(latencies)}")
+
+    for seconds, summary in results:
+        print(f"upload: {summary['bytes'] / 1e6:.0f} MB in {seconds:.1f}s, counts {summary['counts']}")
+    total = uploads * size / 1e6
+    print(f"{uploads} concurrent uploads, {total:.0f} MB in {elapsed:.1f}s ({total / elapsed:.0f} MB/s)")
+
+
+def main():
+    """
+        Run against a server started with python main.py (or uvicorn app.api:app)
+    """
+    parser = argparse.ArgumentParser(description="Load test for /logs/analyze")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Base URL of the API")
+    parser.add_argument("--uploads", type=int, default=4, help="Concurrent uploads")
+    parser.add_argument("--size-mb", type=int, default=100, help="Size of every upload in MB")
+    parser.add_argument("--path", action="append", dest="paths",
+                        help="Endpoint polled during the uploads (default: /metrics and /)")
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.uploads, args.size_mb, args.paths or ["/metrics", "/"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,13 @@
-from fastapi import APIRouter, HTTPException
-from services.aws_service import get_bucket_info
+from fastapi import APIRouter, HTTPException, Query
+from services.aws_service import get_bucket_info, get_instance_info
 
 router = APIRouter()
 
 @router.get("/s3",status_code=200)
-def get_buckets():
+def get_buckets(details: bool = Query(False, description="Add region, size, object count and lifecycle rules per bucket")):
 
     try:
-        buckets_info = get_bucket_info()
+        buckets_info = get_bucket_info(details)
         return buckets_info
     except:
         raise HTTPException(
@@ -19,9 +19,11 @@ def get_buckets():
 
 @router.get("/ec2",status_code=200)
 def get_instances():
-
+    """
+        EC2 instance counts by state and type across all enabled regions
+    """
     try:
-        return {"message":"EC2 Utitlites in progress"}
+        return get_instance_info()
     except:
         raise HTTPException(
             status_code=500,
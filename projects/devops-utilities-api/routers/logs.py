@@ -0,0 +1,36 @@
+from fastapi import APIRouter, HTTPException, Request
+from starlette.requests import ClientDisconnect
+from services.log_service import LevelCounter, LineTooLong
+
+router = APIRouter()
+
+@router.post("/analyze",status_code=200)
+async def analyze_logs(request: Request):
+    """
+        Counts INFO / WARNING / ERROR lines of a log file sent as the raw
+        request body, streamed (chunked) uploads are counted while they arrive
+        e.g. curl -X POST -T app.log http://localhost:8000/logs/analyze
+    """
+    counter = LevelCounter()
+    try:
+        async for chunk in request.stream():
+            await counter.feed(chunk)
+        return await counter.finish()
+    except ClientDisconnect:
+        counter.cancel()
+        raise HTTPException(
+            status_code=400,
+            detail="Upload interrupted"
+        )
+    except LineTooLong as e:
+        counter.cancel()
+        raise HTTPException(
+            status_code=413,
+            detail=str(e)
+        )
+    except Exception:
+        counter.cancel()
+        raise HTTPException(
+            status_code=500,
+            detail="Internal Server Error"
+        )
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, HTTPException
-from services.metrics_service import get_system_metrics
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import Response
+from services.metrics_service import get_system_metrics, get_metrics_history, get_top_processes
+from services.prometheus_service import CONTENT_TYPE, render
 
 router = APIRouter()
 
 @router.get("/metrics",status_code=200)
-def get_metrics():
+async def get_metrics():
 
     try:
         metrics = get_system_metrics()
@@ -14,3 +17,69 @@ def get_metrics():
             status_code=500,
             detail="Internal Server Error"
         )
+
+
+@router.get("/metrics/history",status_code=200)
+async def get_history(
+    start: datetime | None = Query(None, alias="from", description="ISO time or epoch seconds, default: 1 hour ago"),
+    end: datetime | None = Query(None, alias="to", description="ISO time or epoch seconds, default: now"),
+    step: int = Query(60, ge=1, description="Seconds per point")
+):
+    """
+        min / avg / max / p95 of CPU, Memory and Disk usage per step,
+        e.g. /metrics/history?from=2025-01-10T09:00:00&to=2025-01-10T10:00:00&step=300
+    """
+    try:
+        return get_metrics_history(
+            start.timestamp() if start else None,
+            end.timestamp() if end else None,
+            step
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=str(e)
+        )
+    except:
+        raise HTTPException(
+            status_code=500,
+            detail="Internal Server Error"
+        )
+
+
+@router.get("/metrics/processes",status_code=200)
+async def get_processes(
+    top: int = Query(20, ge=1, le=1000, description="Number of processes"),
+    sort: str = Query("cpu", description="cpu or memory (RSS)")
+):
+    """
+        Top processes by CPU or memory plus CPU usage per core,
+        e.g. /metrics/processes?top=20&sort=memory
+    """
+    try:
+        return await get_top_processes(top, sort)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=str(e)
+        )
+    except Exception:
+        raise HTTPException(
+            status_code=500,
+            detail="Internal Server Error"
+        )
+
+
+@router.get("/metrics/prometheus",status_code=200)
+async def get_prometheus_metrics():
+    """
+        Prometheus text exposition: CPU per core, memory, disk per mount,
+        network IO and request latency histograms of this API
+    """
+    try:
+        return Response(content=render(), media_type=CONTENT_TYPE)
+    except Exception:
+        raise HTTPException(
+            status_code=500,
+            detail="Internal Server Error"
+        )
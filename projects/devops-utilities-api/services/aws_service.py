@@ -1,26 +1,263 @@
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 import boto3
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
 from datetime import datetime, timezone,timedelta
 
-def get_bucket_info():
-    s3_client = boto3.client("s3")
+# Seconds a cached inventory is served as is, set AWS_CACHE_TTL to change it
+CACHE_TTL = float(os.environ.get("AWS_CACHE_TTL", "60"))
+# Seconds past the TTL a stale inventory is still served while it is refreshed
+CACHE_STALE = float(os.environ.get("AWS_CACHE_STALE", "600"))
+# Seconds the per-bucket details (size, objects, region, lifecycle) are kept,
+# listing every object is slow and billed, set AWS_DETAILS_TTL to change it
+DETAILS_TTL = float(os.environ.get("AWS_DETAILS_TTL", "900"))
+# Buckets enriched at the same time, also the connection pool size of every client
+DETAILS_WORKERS = int(os.environ.get("AWS_DETAILS_WORKERS", "32"))
+# Region of the describe_regions call, the enabled regions are then queried in parallel
+DEFAULT_REGION = os.environ.get("AWS_REGION") or os.environ.get("AWS_DEFAULT_REGION") or "us-east-1"
+REGIONS_TTL = 24 * 3600 # enabled regions hardly ever change
+CLIENT_CONFIG = Config(max_pool_connections=DETAILS_WORKERS, retries={"mode":"adaptive", "max_attempts":5})
 
-    buckets = s3_client.list_buckets()["Buckets"]
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(service, region=None):
+    """
+        Long-lived boto3 client per (service, region) shared by all requests,
+        boto3 clients are thread safe and keep their connection pool
+    """
+    key = (service, region)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = boto3.client(service, region_name=region, config=CLIENT_CONFIG)
+    return client
+
+
+class CachedValue:
+    """
+        Value loaded by loader() and kept for ttl seconds.
+        Until ttl + stale seconds the old value is still returned at once while
+        one background thread loads a new one (stale-while-revalidate); only
+        an empty or too old cache makes the caller wait, and concurrent
+        callers then share that one load
+    """
+
+    def __init__(self, loader, ttl=CACHE_TTL, stale=CACHE_STALE):
+        self.loader = loader
+        self.ttl = ttl
+        self.stale = stale
+        self.value = None
+        self.loaded_at = None # time.monotonic() of the last successful load
+        self.lock = threading.Lock() # guards refreshing only, never held while loading
+        self.load_lock = threading.Lock() # one load at a time
+        self.refreshing = False
+
+    def age(self):
+        return None if self.loaded_at is None else time.monotonic() - self.loaded_at
+
+    def get(self):
+        age = self.age()
+        if age is not None and age < self.ttl:
+            return self.value
+        if age is not None and age < self.ttl + self.stale:
+            with self.lock:
+                start = not self.refreshing
+                self.refreshing = True
+            if start:
+                threading.Thread(target=self.refresh, daemon=True).start()
+            return self.value
+        with self.load_lock:
+            age = self.age()
+            if age is None or age >= self.ttl:
+                self.load()
+            return self.value
+
+    def load(self):
+        value = self.loader()
+        self.value = value
+        self.loaded_at = time.monotonic()
+
+    def refresh(self):
+        """
+            Background reload, a failure keeps serving the stale value
+        """
+        try:
+            with self.load_lock:
+                self.load()
+        except Exception:
+            pass
+        finally:
+            with self.lock:
+                self.refreshing = False
+
+
+def error_code(e):
+    """
+        Code of a ClientError (AccessDenied, ...) or the name of a
+        BotoCoreError (EndpointConnectionError, ReadTimeoutError, ...)
+    """
+    return e.response["Error"]["Code"] if isinstance(e, ClientError) else type(e).__name__
+
+
+def list_buckets():
+    """
+        All buckets of the account, following the continuation tokens
+    """
+    buckets = []
+    for page in get_client("s3").get_paginator("list_buckets").paginate():
+        buckets.extend(page["Buckets"])
+    return buckets
+
+
+def get_bucket_details(bucket_name):
+    """
+        Region, total size, object count and lifecycle rules of one bucket.
+        Objects are listed with a client of the bucket's own region so
+        no request is redirected; errors such as AccessDenied or a timeout
+        are reported for this bucket only
+    """
+    details = {"name":bucket_name}
+    try:
+        location = get_client("s3").get_bucket_location(Bucket=bucket_name)["LocationConstraint"]
+        # us-east-1 has no location constraint and EU is the legacy name of eu-west-1
+        region = {None:"us-east-1", "":"us-east-1", "EU":"eu-west-1"}.get(location, location)
+        details["region"] = region
+
+        size = 0
+        objects = 0
+        for page in get_client("s3", region).get_paginator("list_objects_v2").paginate(Bucket=bucket_name):
+            for obj in page.get("Contents", ()):
+                size += obj["Size"]
+            objects += page.get("KeyCount", 0)
+        details["size_bytes"] = size
+        details["object_count"] = objects
+
+        try:
+            rules = get_client("s3", region).get_bucket_lifecycle_configuration(Bucket=bucket_name)["Rules"]
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "NoSuchLifecycleConfiguration":
+                raise
+            rules = []
+        details["lifecycle_rules"] = sum(1 for rule in rules if rule.get("Status") == "Enabled")
+    except (ClientError, BotoCoreError) as e:
+        details["error"] = error_code(e)
+    return details
+
+
+def load_bucket_details(workers=DETAILS_WORKERS):
+    """
+        Details of every bucket, enriched concurrently by at most workers
+        threads sharing the clients, so the wall time is about
+        (buckets / workers) x the time of one bucket instead of the sum
+    """
+    names = [bucket["Name"] for bucket in bucket_inventory.get()]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(get_bucket_details, names))
+
+
+bucket_inventory = CachedValue(list_buckets)
+bucket_details = CachedValue(load_bucket_details, ttl=DETAILS_TTL)
+
+
+def get_bucket_info(details=False):
+    buckets = bucket_inventory.get()
     current_date = datetime.now(timezone.utc).astimezone()
+    days_ago_90 = current_date - timedelta(days=90)
     new_buckets = []
     old_buckets = []
     for bucket in buckets:
         bucket_name = bucket["Name"]
         creation_date = bucket["CreationDate"]
-        days_ago_90 = current_date - timedelta(days=90)
         if creation_date < days_ago_90:
             old_buckets.append(bucket_name)
         else:
             new_buckets.append(bucket_name)
 
-    return {
+    info = {
         "total_buckets":len(buckets),
         "new_buckets":len(new_buckets),
         "old_buckets":len(old_buckets),
         "new_buckets_names":new_buckets,
-        "old_buckets_names":old_buckets
-    }
\ No newline at end of file
+        "old_buckets_names":old_buckets,
+        "cache_age_seconds":round(bucket_inventory.age(), 3)
+    }
+    if details:
+        enriched = bucket_details.get()
+        info["total_size_bytes"] = sum(bucket.get("size_bytes", 0) for bucket in enriched)
+        info["total_objects"] = sum(bucket.get("object_count", 0) for bucket in enriched)
+        info["buckets"] = sorted(enriched, key=lambda bucket: bucket.get("size_bytes", 0), reverse=True)
+        info["details_cache_age_seconds"] = round(bucket_details.age(), 3)
+    return info
+
+
+def list_regions():
+    """
+        Regions enabled for the account
+    """
+    regions = get_client("ec2", DEFAULT_REGION).describe_regions()["Regions"]
+    return sorted(region["RegionName"] for region in regions)
+
+
+def describe_region_instances(region):
+    """
+        Instance counts by state and type of one region, read with the
+        region's cached client and the describe_instances paginator.
+        An unreachable or denied region is reported alone
+    """
+    start = time.perf_counter()
+    by_state = Counter()
+    by_type = Counter()
+    try:
+        for page in get_client("ec2", region).get_paginator("describe_instances").paginate():
+            for reservation in page["Reservations"]:
+                for instance in reservation["Instances"]:
+                    by_state[instance["State"]["Name"]] += 1
+                    by_type[instance["InstanceType"]] += 1
+    except (ClientError, BotoCoreError) as e:
+        return {"error":error_code(e), "seconds":round(time.perf_counter() - start, 3)}
+    return {
+        "instances":sum(by_state.values()),
+        "by_state":dict(by_state),
+        "by_type":dict(by_type),
+        "seconds":round(time.perf_counter() - start, 3)
+    }
+
+
+def load_instance_inventory():
+    """
+        Instances of every enabled region, all regions are queried at the
+        same time so the wall time is close to that of the slowest region
+    """
+    regions = region_names.get()
+    with ThreadPoolExecutor(max_workers=min(len(regions), DETAILS_WORKERS)) as pool:
+        return dict(zip(regions, pool.map(describe_region_instances, regions)))
+
+
+region_names = CachedValue(list_regions, ttl=REGIONS_TTL)
+instance_inventory = CachedValue(load_instance_inventory)
+
+
+def get_instance_info():
+    regions = instance_inventory.get()
+    by_state = Counter()
+    by_type = Counter()
+    for region in regions.values():
+        by_state.update(region.get("by_state", {}))
+        by_type.update(region.get("by_type", {}))
+
+    return {
+        "total_instances":sum(by_state.values()),
+        "regions_queried":len(regions),
+        "by_state":dict(by_state.most_common()),
+        "by_type":dict(by_type.most_common()),
+        "regions":{name: region for name, region in regions.items() if region.get("instances") or "error" in region},
+        "cache_age_seconds":round(instance_inventory.age(), 3)
+    }
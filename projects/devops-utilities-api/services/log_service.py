@@ -0,0 +1,167 @@
+import asyncio
+import multiprocessing
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+LEVELS = ("INFO", "WARNING", "ERROR")
+BLOCK_SIZE = 1024 * 1024 # bytes of complete lines counted by one task
+MAX_PENDING_BLOCKS = 2 # blocks of one upload being counted at the same time
+# Longest line buffered while waiting for its newline, a longer one ends the upload
+MAX_LINE_SIZE = int(os.environ.get("LOGS_MAX_LINE_SIZE", str(8 * BLOCK_SIZE)))
+
+# Lowercase token of each level and a pattern from its first to its last
+# occurrence on one line, to count a line only once
+TOKENS = {level: level.lower().encode() for level in LEVELS}
+REPEAT_PATTERNS = {level: re.compile(token + rb"[^\n]*" + token) for level, token in TOKENS.items()}
+
+_pool = None
+
+
+def get_process_pool():
+    """
+        Process pool shared by all uploads, started by the app lifespan.
+        The app runs threads (samplers, thread pool, cache refreshes) and
+        forking a threaded process can deadlock the child, so workers come
+        from a forkserver (spawn where there is none)
+    """
+    global _pool
+    if _pool is None:
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _pool = ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=multiprocessing.get_context(method))
+    return _pool
+
+
+def discard_process_pool(pool):
+    """
+        Drop a broken pool (a worker was killed) so the next upload starts a new one
+    """
+    global _pool
+    if _pool is pool:
+        _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_process_pool():
+    """
+        Stop the workers when the app stops
+    """
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+def count_levels(block):
+    """
+        Count the lines of a block of complete lines that mention
+        INFO / WARNING / ERROR (ignoring case), runs in a worker process
+    """
+    lower = block.lower()
+    counts = {}
+    for level in LEVELS:
+        token = TOKENS[level]
+        count = lower.count(token)
+        # A line holding the token k times was counted k times above
+        for match in REPEAT_PATTERNS[level].finditer(lower):
+            count -= match.group().count(token) - 1
+        counts[level] = count
+    return counts
+
+
+class LineTooLong(ValueError):
+    """
+        A line longer than MAX_LINE_SIZE, e.g. a binary file without newlines
+    """
+
+
+class LevelCounter:
+    """
+        Counts log levels of an upload while its bytes arrive.
+        Chunks are joined into blocks of complete lines and every block is
+        counted in the process pool, so the event loop only copies bytes.
+        At most MAX_PENDING_BLOCKS blocks per upload are in flight: feed()
+        waits for the oldest one, which stops reading the request body
+        until the pool catches up, so memory stays bounded for any size.
+        A line is never split (it must count once per level), so a body
+        with no newline for MAX_LINE_SIZE bytes is refused with LineTooLong
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.pending = deque()
+        self.counts = dict.fromkeys(LEVELS, 0)
+        self.lines = 0
+        self.bytes = 0
+        self.start = time.perf_counter()
+
+    async def feed(self, chunk):
+        """
+            Add the next chunk of the request body
+        """
+        self.bytes += len(chunk)
+        self.buffer += chunk
+        if len(self.buffer) < BLOCK_SIZE:
+            return
+        cut = self.buffer.rfind(b"\n") + 1
+        if cut:
+            block = bytes(self.buffer[:cut])
+            del self.buffer[:cut]
+            await self.submit(block)
+        elif len(self.buffer) > MAX_LINE_SIZE:
+            raise LineTooLong(f"Line longer than {MAX_LINE_SIZE} bytes at byte {self.bytes - len(self.buffer)}")
+
+    async def submit(self, block):
+        self.lines += block.count(b"\n")
+        if len(self.pending) >= MAX_PENDING_BLOCKS:
+            await self.collect()
+        loop = asyncio.get_running_loop()
+        pool = get_process_pool()
+        try:
+            self.pending.append((pool, loop.run_in_executor(pool, count_levels, block)))
+        except BrokenProcessPool:
+            discard_process_pool(pool)
+            raise
+
+    async def collect(self):
+        pool, future = self.pending.popleft()
+        try:
+            counts = await future
+        except BrokenProcessPool:
+            discard_process_pool(pool)
+            raise
+        for level, count in counts.items():
+            self.counts[level] += count
+
+    async def finish(self):
+        """
+            Count the last (possibly unterminated) line, wait for every
+            block and return the summary
+        """
+        if self.buffer:
+            block = bytes(self.buffer)
+            self.buffer.clear()
+            await self.submit(block)
+            if not block.endswith(b"\n"):
+                self.lines += 1
+        while self.pending:
+            await self.collect()
+        seconds = time.perf_counter() - self.start
+        return {
+            "bytes":self.bytes,
+            "lines":self.lines,
+            "counts":self.counts,
+            "seconds":round(seconds, 3),
+            "mb_per_second":round(self.bytes / 1e6 / seconds, 1) if seconds else None
+        }
+
+    def cancel(self):
+        """
+            Drop the blocks still being counted, e.g. when the client disconnects
+        """
+        for _, future in self.pending:
+            future.cancel()
+        self.pending.clear()
@@ -1,25 +1,337 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from array import array
+
 import psutil
 
+from services.prometheus_service import refresh_system_metrics
+
+logger = logging.getLogger(__name__)
+
+CPU_THRESHOLD = 10
+# Seconds between two samples, set METRICS_SAMPLE_INTERVAL to change it
+SAMPLE_INTERVAL = float(os.environ.get("METRICS_SAMPLE_INTERVAL", "1"))
+# Seconds between two process table samples, set METRICS_PROCESS_INTERVAL to change it
+PROCESS_INTERVAL = float(os.environ.get("METRICS_PROCESS_INTERVAL", "5"))
+# Read together per process, process_iter batches them with oneshot()
+PROCESS_ATTRS = ["pid", "name", "username", "cpu_percent", "memory_info", "num_threads", "status"]
+PROCESS_SORT_KEYS = {"cpu":3, "memory":4} # index in the process rows
+METRICS = ("cpu_percentage", "memory_percentage", "disk_percentage")
+# History tiers (name, seconds per slot, slots kept):
+# 1 hour of seconds, 1 day of minutes and 30 days of hours
+TIERS = (("1s", 1, 3600), ("1m", 60, 1440), ("1h", 3600, 720))
+HISTOGRAM_BINS = 101 # one bin per whole percent, p95 of the 1m / 1h tiers
+MAX_HISTORY_POINTS = 10000
+
+latest_sample = None
+latest_processes = None
+
+
+class Tier:
+    """
+        Fixed-size ring buffer of per-slot aggregates of every metric
+        (min, max, sum, count and a percent histogram) kept in typed arrays.
+        A sample goes to slot (time // resolution) % capacity, a slot that
+        still holds an older period is reset first, so every tier is
+        downsampled as samples arrive and old data is simply overwritten
+    """
+
+    def __init__(self, name, resolution, capacity, histogram=True):
+        self.name = name
+        self.resolution = resolution
+        self.capacity = capacity
+        size = capacity * len(METRICS)
+        self.periods = array("q", [-1]) * capacity # period number held by each slot
+        self.counts = array("I", [0]) * capacity
+        self.mins = array("f", [0.0]) * size
+        self.maxs = array("f", [0.0]) * size
+        self.sums = array("d", [0.0]) * size
+        self.histograms = array("I", [0]) * (size * HISTOGRAM_BINS) if histogram else None
+
+    def add(self, timestamp, values):
+        period = int(timestamp // self.resolution)
+        slot = period % self.capacity
+        base = slot * len(METRICS)
+        if self.periods[slot] != period:
+            self.periods[slot] = period
+            self.counts[slot] = 0
+            if self.histograms is not None:
+                start = base * HISTOGRAM_BINS
+                end = start + len(METRICS) * HISTOGRAM_BINS
+                self.histograms[start:end] = array("I", [0]) * (end - start)
+        first = self.counts[slot] == 0
+        self.counts[slot] += 1
+        for index, value in enumerate(values, base):
+            if first:
+                self.mins[index] = self.maxs[index] = value
+                self.sums[index] = value
+            else:
+                self.mins[index] = min(self.mins[index], value)
+                self.maxs[index] = max(self.maxs[index], value)
+                self.sums[index] += value
+            if self.histograms is not None:
+                self.histograms[index * HISTOGRAM_BINS + min(max(int(value), 0), HISTOGRAM_BINS - 1)] += 1
+
+    def covers(self, timestamp, now):
+        """
+            True while the slots for timestamp have not been overwritten yet,
+            give or take the slot being written now
+        """
+        return timestamp >= now - self.resolution * (self.capacity + 1)
+
+    def query(self, start, end, step, now):
+        """
+            Merge the slots in [start, end) into windows of step seconds,
+            aligned on multiples of step, one point per window with samples
+        """
+        windows = {}
+        first = max(math.ceil(start / self.resolution), int(now // self.resolution) - self.capacity + 1)
+        # Nothing is stored past the current period, whatever end asks for
+        last = min(math.ceil(end / self.resolution), int(now // self.resolution) + 1)
+        for period in range(first, last):
+            slot = period % self.capacity
+            if self.periods[slot] != period or not self.counts[slot]:
+                continue
+            key = period * self.resolution // step
+            window = windows.get(key)
+            if window is None:
+                window = windows[key] = {
+                    "samples":0,
+                    "metrics":[[math.inf, -math.inf, 0.0, []] for _ in METRICS]
+                }
+            window["samples"] += self.counts[slot]
+            for metric, index in enumerate(range(slot * len(METRICS), (slot + 1) * len(METRICS))):
+                low, high, total, spread = window["metrics"][metric]
+                window["metrics"][metric][:3] = (min(low, self.mins[index]), max(high, self.maxs[index]),
+                                                 total + self.sums[index])
+                if self.histograms is None:
+                    spread.append(self.sums[index] / self.counts[slot])
+                else:
+                    spread.append(self.histograms[index * HISTOGRAM_BINS:(index + 1) * HISTOGRAM_BINS])
+
+        points = []
+        for key in sorted(windows):
+            window = windows[key]
+            point = {"timestamp":key * step, "samples":window["samples"]}
+            for name, (low, high, total, spread) in zip(METRICS, window["metrics"]):
+                point[name] = {
+                    "min":round(low, 2),
+                    "avg":round(total / window["samples"], 2),
+                    "max":round(high, 2),
+                    "p95":round(self.p95(spread), 2)
+                }
+            points.append(point)
+        return points
+
+    def p95(self, spread):
+        """
+            95th percentile of the slot values (1s tier)
+            or of the merged percent histograms (1m / 1h tiers)
+        """
+        if self.histograms is None:
+            values = sorted(spread)
+            return values[math.ceil(0.95 * len(values)) - 1]
+        merged = [sum(column) for column in zip(*spread)]
+        rank = math.ceil(0.95 * sum(merged))
+        seen = 0
+        for percent, count in enumerate(merged):
+            seen += count
+            if seen >= rank:
+                return float(percent)
+        return float(HISTOGRAM_BINS - 1)
+
+
+class MetricsHistory:
+    """
+        Samples of the last hour per second, of the last day per minute and
+        of the last 30 days per hour, about 3 MB in total whatever the uptime
+    """
+
+    def __init__(self, tiers=TIERS):
+        # The 1s tier has about one sample per slot, its p95 uses the slot values
+        self.tiers = [Tier(name, resolution, capacity, histogram=resolution > 1)
+                      for name, resolution, capacity in tiers]
+
+    def add(self, timestamp, values):
+        for tier in self.tiers:
+            tier.add(timestamp, values)
+
+    def pick_tier(self, start, step, now):
+        """
+            Finest tier that still covers start with slots no wider than step,
+            else the finest tier that covers start, else the coarsest one
+        """
+        covering = [tier for tier in self.tiers if tier.covers(start, now)]
+        for tier in covering:
+            if tier.resolution <= step:
+                return tier
+        return covering[0] if covering else self.tiers[-1]
+
+    def query(self, start, end, step):
+        now = time.time()
+        end = min(end, now)
+        tier = self.pick_tier(start, step, now)
+        step = max(step, tier.resolution)
+        return {
+            "tier":tier.name,
+            "from":start,
+            "to":end,
+            "step":step,
+            "points":tier.query(start, end, step, now)
+        }
+
+
+history = MetricsHistory()
+
+
+def take_sample():
+    """
+        Reads CPU, Memory and Disk usage once without sleeping,
+        cpu_percent covers the time since the previous call
+    """
+    global latest_sample
+    sample = {
+        "timestamp":time.time(),
+        "monotonic":time.monotonic(),
+        "cpu_percentage":psutil.cpu_percent(interval=None),
+        "cpu_per_core":psutil.cpu_percent(percpu=True),
+        "memory_percentage":psutil.virtual_memory().percent,
+        "disk_percentage":psutil.disk_usage("/").percent
+    }
+    history.add(sample["timestamp"], [sample[name] for name in METRICS])
+    latest_sample = sample
+    return sample
+
+
+async def run_sampler(interval=SAMPLE_INTERVAL):
+    """
+        Background task started with the app, takes a sample every
+        interval seconds so requests never wait for psutil. The Prometheus
+        text reads every disk and NIC, so it is rendered in a thread.
+        A failed sample is logged and the next one is taken as usual
+    """
+    psutil.cpu_percent(interval=None) # the first call only sets the starting point
+    psutil.cpu_percent(percpu=True)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            sample = take_sample()
+            await asyncio.to_thread(refresh_system_metrics, sample["cpu_per_core"])
+        except Exception:
+            logger.exception("Metrics sample failed")
+
+
+def take_process_sample():
+    """
+        Reads every process once. process_iter keeps the Process objects
+        between calls, so cpu_percent is the usage since the previous sample
+        (0.0 the first time a process is seen) without sleeping.
+        Rows are sorted by CPU and by RSS here so requests only slice them
+    """
+    global latest_processes
+    start = time.perf_counter()
+    total_memory = psutil.virtual_memory().total
+    rows = []
+    for process in psutil.process_iter(PROCESS_ATTRS, ad_value=None):
+        info = process.info
+        rss = info["memory_info"].rss if info["memory_info"] else 0
+        rows.append((info["pid"], info["name"], info["username"], info["cpu_percent"] or 0.0, rss,
+                     round(rss * 100 / total_memory, 2), info["num_threads"], info["status"]))
+    latest_processes = {
+        "timestamp":time.time(),
+        "monotonic":time.monotonic(),
+        "seconds":time.perf_counter() - start,
+        "by":{name: sorted(rows, key=lambda row: row[key], reverse=True)
+              for name, key in PROCESS_SORT_KEYS.items()}
+    }
+    return latest_processes
+
+
+async def run_process_sampler(interval=PROCESS_INTERVAL):
+    """
+        Background task started with the app, samples the process table every
+        interval seconds in a worker thread, thousands of processes take
+        hundreds of milliseconds to read and must not block the event loop.
+        A failed sample is logged and the next one is taken as usual
+    """
+    while True:
+        try:
+            await asyncio.to_thread(take_process_sample)
+        except Exception:
+            logger.exception("Process sample failed")
+        await asyncio.sleep(interval)
+
 
 def get_system_metrics():
     """
         This API gets the System Metrics(CPU, Memory, Disk, System Health)
         Based on a CPU Threshold i.e 10 (Configurable)
+        from the latest background sample, sample_age_seconds tells how old it is
     """
-    cpu_percent = psutil.cpu_percent(interval=1)
-    memory_percent = psutil.virtual_memory().percent
-    disk_percent = psutil.disk_usage("/").percent
+    sample = latest_sample or take_sample()
+    cpu_percent = sample["cpu_percentage"]
 
-    cpu_threshold = 10
-
-    status = "High CPU" if cpu_percent > cpu_threshold else "Healthy"
+    status = "High CPU" if cpu_percent > CPU_THRESHOLD else "Healthy"
 
     return {
         "cpu_percentage":cpu_percent,
-        "memory_percentage":memory_percent,
-        "disk_percentage":disk_percent,
-        "cpu_threshold":cpu_threshold,
-        "system_status":status
+        "cpu_per_core":sample["cpu_per_core"],
+        "memory_percentage":sample["memory_percentage"],
+        "disk_percentage":sample["disk_percentage"],
+        "cpu_threshold":CPU_THRESHOLD,
+        "system_status":status,
+        "sample_age_seconds":round(time.monotonic() - sample["monotonic"], 3),
+        "sample_interval_seconds":SAMPLE_INTERVAL
+    }
+
+
+def get_metrics_history(start=None, end=None, step=60):
+    """
+        min / avg / max / p95 of every metric per step seconds between
+        start and end (epoch seconds, default: the last hour),
+        end is capped to now as there are no samples after it
+    """
+    now = time.time()
+    end = now if end is None else min(end, now)
+    start = end - 3600 if start is None else start
+    if end <= start:
+        raise ValueError("'from' must be before 'to' and in the past")
+    if (end - start) / step > MAX_HISTORY_POINTS:
+        raise ValueError(f"more than {MAX_HISTORY_POINTS} points, use a larger step")
+    return history.query(start, end, step)
+
+
+async def get_top_processes(top=20, sort="cpu"):
+    """
+        The top processes by CPU or RSS from the latest background sample,
+        sample_age_seconds tells how old it is
+    """
+    if sort not in PROCESS_SORT_KEYS:
+        raise ValueError(f"sort must be one of {', '.join(PROCESS_SORT_KEYS)}")
+    snapshot = latest_processes or await asyncio.to_thread(take_process_sample)
+    sample = latest_sample or take_sample()
+    rows = snapshot["by"][sort]
+    return {
+        "process_count":len(rows),
+        "sort":sort,
+        "cpu_per_core":sample["cpu_per_core"],
+        "sample_age_seconds":round(time.monotonic() - snapshot["monotonic"], 3),
+        "sample_seconds":round(snapshot["seconds"], 3),
+        "sample_interval_seconds":PROCESS_INTERVAL,
+        "processes":[
+            {
+                "pid":pid,
+                "name":name,
+                "username":username,
+                "cpu_percentage":cpu,
+                "memory_rss_bytes":rss,
+                "memory_percentage":memory,
+                "num_threads":threads,
+                "status":status
+            }
+            for pid, name, username, cpu, rss, memory, threads, status in rows[:top]
+        ]
     }
-        
-        
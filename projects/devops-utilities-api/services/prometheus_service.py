@@ -0,0 +1,182 @@
+import time
+from bisect import bisect_left
+from itertools import accumulate
+
+import psutil
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Upper bounds (seconds) of the request latency buckets, the Prometheus client defaults
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# File systems that are not real disks, left out like node_exporter does
+IGNORED_FSTYPES = {"tmpfs", "devtmpfs", "overlay", "squashfs", "proc", "sysfs", "cgroup", "cgroup2"}
+# Methods labelled as sent, any other one is labelled "other" so clients cannot add series
+METHODS = {"GET", "POST", "PUT", "DELETE", "PATCH", "HEAD", "OPTIONS"}
+
+# System metrics text, rendered by refresh_system_metrics() in the background sampler
+system_text = ""
+
+
+def escape(value):
+    """
+        Escape a label value for the text exposition format
+    """
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def family(lines, name, kind, help_text, samples):
+    """
+        Append one metric family, samples are (label text, value) pairs
+    """
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    for labels, value in samples:
+        lines.append(f"{name}{{{labels}}} {value}" if labels else f"{name} {value}")
+
+
+def refresh_system_metrics(cpu_per_core=None):
+    """
+        Read CPU per core, memory, disk per mount and network IO once and
+        keep them rendered, so a scrape only joins text and never waits for psutil.
+        cpu_per_core is the sampler's cpu_percent(percpu=True), psutil keeps a
+        single starting point for it so it is read in one place only
+    """
+    global system_text
+    lines = []
+
+    cpu_times = psutil.cpu_times(percpu=True)
+    family(lines, "devops_cpu_seconds_total", "counter", "Seconds the CPUs spent in each mode.",
+           [(f'cpu="{cpu}",mode="{mode}"', value)
+            for cpu, times in enumerate(cpu_times) for mode, value in times._asdict().items()])
+    family(lines, "devops_cpu_usage_percent", "gauge", "CPU usage per core since the previous sample.",
+           [(f'cpu="{cpu}"', value) for cpu, value in enumerate(cpu_per_core or psutil.cpu_percent(percpu=True))])
+
+    memory = psutil.virtual_memory()
+    family(lines, "devops_memory_total_bytes", "gauge", "Total physical memory.", [("", memory.total)])
+    family(lines, "devops_memory_available_bytes", "gauge", "Memory available without swapping.",
+           [("", memory.available)])
+    family(lines, "devops_memory_used_bytes", "gauge", "Memory in use.", [("", memory.used)])
+
+    disks = []
+    for partition in psutil.disk_partitions():
+        if partition.fstype in IGNORED_FSTYPES:
+            continue
+        try:
+            usage = psutil.disk_usage(partition.mountpoint)
+        except OSError:
+            continue
+        labels = (f'device="{escape(partition.device)}",mountpoint="{escape(partition.mountpoint)}",'
+                  f'fstype="{escape(partition.fstype)}"')
+        disks.append((labels, usage))
+    family(lines, "devops_filesystem_size_bytes", "gauge", "File system size per mount.",
+           [(labels, usage.total) for labels, usage in disks])
+    family(lines, "devops_filesystem_free_bytes", "gauge", "File system free space per mount.",
+           [(labels, usage.free) for labels, usage in disks])
+
+    nics = [(f'interface="{escape(name)}"', counters)
+            for name, counters in psutil.net_io_counters(pernic=True).items()]
+    for name, field, help_text in (
+        ("devops_network_receive_bytes_total", "bytes_recv", "Bytes received per interface."),
+        ("devops_network_transmit_bytes_total", "bytes_sent", "Bytes sent per interface."),
+        ("devops_network_receive_packets_total", "packets_recv", "Packets received per interface."),
+        ("devops_network_transmit_packets_total", "packets_sent", "Packets sent per interface."),
+        ("devops_network_receive_errors_total", "errin", "Receive errors per interface."),
+        ("devops_network_transmit_errors_total", "errout", "Transmit errors per interface."),
+        ("devops_network_receive_drop_total", "dropin", "Dropped incoming packets per interface."),
+        ("devops_network_transmit_drop_total", "dropout", "Dropped outgoing packets per interface."),
+    ):
+        family(lines, name, "counter", help_text, [(labels, getattr(counters, field)) for labels, counters in nics])
+
+    system_text = "\n".join(lines) + "\n"
+
+
+class LatencyHistogram:
+    """
+        Request latency histogram per (method, route, status).
+        observe() only bumps one bucket and marks the series changed, render()
+        rebuilds the text of the changed series only. Both run on the event
+        loop, so no lock
+    """
+
+    name = "devops_http_request_duration_seconds"
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.bounds = [f"{bound:g}" for bound in buckets] + ["+Inf"]
+        self.series = {}
+        self.texts = {}
+        self.changed = set()
+
+    def observe(self, labels, seconds):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, self.prefixes(labels)]
+        series[0][bisect_left(self.buckets, seconds)] += 1
+        series[1] += seconds
+        self.changed.add(labels)
+
+    def prefixes(self, labels):
+        """
+            Text of every line of a series up to its value, built once per series
+        """
+        method, route, status = labels
+        labels = f'method="{method}",route="{escape(route)}",status="{status}"'
+        return ([f'{self.name}_bucket{{{labels},le="{bound}"}} ' for bound in self.bounds]
+                + [f"{self.name}_sum{{{labels}}} ", f"{self.name}_count{{{labels}}} "])
+
+    def render_series(self, labels):
+        counts, total, prefixes = self.series[labels]
+        values = list(accumulate(counts))
+        values += (total, values[-1])
+        return "".join([f"{prefix}{value}\n" for prefix, value in zip(prefixes, values)])
+
+    def render(self):
+        for labels in self.changed:
+            self.texts[labels] = self.render_series(labels)
+        self.changed.clear()
+        return (f"# HELP {self.name} Time to serve a request, per route.\n"
+                f"# TYPE {self.name} histogram\n" + "".join(self.texts.values()))
+
+
+request_latency = LatencyHistogram()
+
+
+class LatencyMiddleware:
+    """
+        Plain ASGI middleware timing every HTTP request until its response
+        is sent. Requests are labelled with the route template (/metrics/history,
+        not the raw URL), so the number of series stays bounded
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            route = scope.get("route")
+            method = scope["method"] if scope["method"] in METHODS else "other"
+            request_latency.observe(
+                (method, route.path if route is not None else "unmatched", status),
+                time.perf_counter() - start
+            )
+
+
+def render():
+    """
+        Text exposition of the cached system metrics and the request latencies
+    """
+    if not system_text:
+        refresh_system_metrics()
+    return system_text + request_latency.render()